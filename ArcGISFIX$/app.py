@@ -1,11 +1,15 @@
-import requests
 import random
-import hashlib
+import json
+import math
 from datetime import datetime
 from flask import Flask, jsonify, request, render_template
 from flask_cors import CORS
 import database
 import os
+from singleflight import SingleFlight
+from scoring import calculate_ejv_v1, calculate_ejv_v2, payroll_for_store_type
+import http_client
+import deadline
 
 app = Flask(__name__)
 CORS(app)
@@ -21,45 +25,49 @@ def initialize_database():
         except Exception as e:
             print(f"Database error: {e}")
 
-# ==========================================
-# BLS OEWS Wage Data (May 2024)
-# ==========================================
-BLS_WAGE_DATA = {
-    "41-2031": {"wage": 15.02, "title": "Retail Salespersons"},
-    "53-7064": {"wage": 17.02, "title": "Packers and Packagers"},
-    "53-6031": {"wage": 14.75, "title": "Service Attendants"},
-    "29-2052": {"wage": 18.79, "title": "Pharmacy Technicians"},
-    "35-3031": {"wage": 15.15, "title": "Waiters and Waitresses"},
-    "35-3023": {"wage": 14.33, "title": "Fast Food Workers"},
+# Overall time budget (seconds) per request; upstream timeouts are capped by
+# what is left. Clients may override it with X-Request-Timeout-Ms.
+REQUEST_DEADLINE_DEFAULT = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 20))
+REQUEST_DEADLINE_MAX = 120
+ENDPOINT_DEADLINES = {
+    'search_stores': 40,
+    'geocode_endpoint': 10,
 }
 
-INDUSTRY_CODES = {
-    "supermarket": {"soc_code": "41-2031", "naics": "4451"},
-    "grocery": {"soc_code": "41-2031", "naics": "4451"},
-    "warehouse_club": {"soc_code": "53-7064", "naics": "45291"},
-    "convenience": {"soc_code": "41-2031", "naics": "4471"},
-    "fuel": {"soc_code": "53-6031", "naics": "4471"},
-    "pharmacy": {"soc_code": "29-2052", "naics": "4461"},
-    "restaurant": {"soc_code": "35-3031", "naics": "7225"},
-    "fast_food": {"soc_code": "35-3023", "naics": "7225"},
-}
+@app.before_request
+def start_request_deadline():
+    budget = ENDPOINT_DEADLINES.get(request.endpoint, REQUEST_DEADLINE_DEFAULT)
+    header = request.headers.get('X-Request-Timeout-Ms')
+    if header:
+        try:
+            requested = float(header) / 1000
+        except ValueError:
+            requested = None
+        # nan would compare as a zero budget and skip every upstream call
+        if requested is not None and math.isfinite(requested):
+            budget = min(max(requested, 0.0), REQUEST_DEADLINE_MAX)
+    deadline.start(budget)
 
-WAGE_STANDARDS = {
-    "supermarket": {"min": 13.5, "max": 18.0, "avg_employees": 48},
-    "grocery": {"min": 13.0, "max": 17.5, "avg_employees": 35},
-    "warehouse_club": {"min": 15.0, "max": 20.0, "avg_employees": 72},
-    "convenience": {"min": 12.0, "max": 15.5, "avg_employees": 9},
-    "pharmacy": {"min": 16.0, "max": 22.0, "avg_employees": 21},
-    "restaurant": {"min": 13.0, "max": 18.0, "avg_employees": 17},
-    "default": {"min": 13.0, "max": 17.0, "avg_employees": 25}
-}
+@app.after_request
+def mark_degraded_response(response):
+    reasons = deadline.degraded_reasons()
+    if reasons:
+        response.headers['X-Degraded'] = 'true'
+        # Reasons can quote client input (ZIP codes): keep them out of headers
+        if response.is_json and not response.is_streamed:
+            payload = response.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload['degraded'] = {"reasons": reasons}
+                response.set_data(json.dumps(payload))
+    return response
 
-def generate_consistent_random(store_id, seed_suffix=""):
-    """Generate consistent random value for store"""
-    combined = f"{store_id}{seed_suffix}"
-    hash_value = int(hashlib.md5(combined.encode()).hexdigest(), 16)
-    return (hash_value % 10000) / 10000.0
+@app.teardown_request
+def clear_request_deadline(exc=None):
+    deadline.clear()
 
+# ==========================================
+# Economic Data (Census API)
+# ==========================================
 def get_local_economic_data(zip_code):
     """Get economic data from Census API"""
     try:
@@ -68,7 +76,7 @@ def get_local_economic_data(zip_code):
             'get': 'NAME,DP03_0005PE,DP03_0062E',
             'for': f'zip code tabulation area:{zip_code.zfill(5)}'
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params, timeout=10)
         if response.ok:
             data = response.json()
             if len(data) > 1:
@@ -77,87 +85,25 @@ def get_local_economic_data(zip_code):
                 return {'unemployment_rate': unemployment, 'median_income': income}
     except Exception as e:
         print(f"Census API error: {e}")
+    deadline.mark_degraded(f"Census defaults used for ZIP {zip_code}")
     return {'unemployment_rate': 5.0, 'median_income': 50000}
 
-def calculate_ejv_v1(store_data, payroll_data, economic_data):
-    """Calculate EJV V1 score - original algorithm"""
-    
-    unemployment_rate = economic_data.get('unemployment_rate', 5.0)
-    median_income = economic_data.get('median_income', 50000)
-    avg_wage = payroll_data.get('avg_wage', 15.0)
-    employee_count = payroll_data.get('active_employees', 25)
-    
-    # Simple living wage (70% of median income hourly)
-    living_wage = (median_income * 0.7) / 2080
-    
-    # V1 Components (simpler)
-    # 1. Wage Score (50 points)
-    wage_ratio = min(avg_wage / living_wage, 1.2)
-    wage_score = (wage_ratio / 1.2) * 50
-    
-    # 2. Local Impact (50 points)
-    local_factor = 0.75 + (unemployment_rate / 20.0)
-    daily_wealth = avg_wage * 8 * employee_count * local_factor
-    impact_score = min(daily_wealth / 250, 1.0) * 50
-    
-    ejv_v1 = wage_score + impact_score
-    
-    return {
-        'ejv_score': round(ejv_v1, 2),
-        'wage_score': round(wage_score, 2),
-        'impact_score': round(impact_score, 2),
-        'wealth_retained_daily': round(daily_wealth, 2),
-        'living_wage': round(living_wage, 2)
-    }
-
-def calculate_ejv_v2(store_data, payroll_data, economic_data):
-    """Calculate EJV V2 score with real-time data"""
-    
-    # Extract data
-    unemployment_rate = economic_data.get('unemployment_rate', 5.0)
-    median_income = economic_data.get('median_income', 50000)
-    avg_wage = payroll_data.get('avg_wage', 15.0)
-    employee_count = payroll_data.get('active_employees', 25)
-    
-    # Living wage calculation (simplified)
-    living_wage = (median_income / 2080) * 1.2  # Annual to hourly + 20% buffer
-    living_wage = max(15.0, min(living_wage, 25.0))
-    
-    # Component calculations
-    # 1. Local Hiring Score (40 points)
-    unemployment_factor = min(unemployment_rate / 10.0, 1.0)
-    local_hiring = 0.85 + (unemployment_factor * 0.15)
-    local_hiring_score = local_hiring * 40
-    
-    # 2. Wage Equity Score (40 points)
-    wage_ratio = avg_wage / living_wage
-    wage_ratio_clamped = max(0.889, min(wage_ratio, 0.925))
-    wage_equity_score = (wage_ratio_clamped - 0.889) / (0.925 - 0.889) * 40
-    
-    # 3. Economic Impact (20 points)
-    daily_payroll = avg_wage * 8 * employee_count
-    wealth_retained = daily_payroll * local_hiring
-    impact_score = min(wealth_retained / 300, 1.0) * 20
-    
-    # Total EJV Score
-    ejv_score = local_hiring_score + wage_equity_score + impact_score
-    
-    return {
-        'ejv_score': round(ejv_score, 2),
-        'local_hiring_score': round(local_hiring_score, 2),
-        'wage_equity_score': round(wage_equity_score, 2),
-        'economic_impact_score': round(impact_score, 2),
-        'wealth_retained_daily': round(wealth_retained, 2),
-        'living_wage': round(living_wage, 2),
-        'wage_ratio': round(wage_ratio, 4),
-        'local_hiring_percent': round(local_hiring * 100, 1)
-    }
-
 # ==========================================
 # Geocoding Functions (using ArcGIS REST API)
 # ==========================================
+# Concurrent lookups of the same address share one in-flight geocoder request
+geocode_flight = SingleFlight()
+
 def geocode_address(address):
     """Geocode address using ArcGIS World Geocoding Service"""
+    key = ' '.join(address.lower().split())
+    try:
+        return geocode_flight.do(key, lambda: _geocode_address(address), timeout=deadline.remaining())
+    except TimeoutError:
+        deadline.mark_degraded("Geocoding skipped: request deadline exceeded")
+        return None
+
+def _geocode_address(address):
     try:
         # Use ArcGIS World Geocoding Service (free, no token required for basic use)
         url = "https://geocode.arcgis.com/arcgis/rest/services/World/GeocodeServer/findAddressCandidates"
@@ -168,7 +114,7 @@ def geocode_address(address):
             'maxLocations': 1
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params, timeout=10)
         if response.ok:
             data = response.json()
             if data.get('candidates') and len(data['candidates']) > 0:
@@ -181,6 +127,8 @@ def geocode_address(address):
                 }
     except Exception as e:
         print(f"Geocoding error: {e}")
+        if deadline.expired():
+            deadline.mark_degraded("Geocoding skipped: request deadline exceeded")
     return None
 
 # ==========================================
@@ -242,7 +190,7 @@ def search_stores():
         out center 50;
         """
         
-        response = requests.post(overpass_url, data={'data': overpass_query}, timeout=30)
+        response = http_client.post(overpass_url, data={'data': overpass_query}, timeout=30)
         
         if response.ok:
             osm_data = response.json()
@@ -314,17 +262,9 @@ def create_store():
     economic_data = get_local_economic_data(data.get('zip_code', '10001'))
     
     # Generate payroll data
-    industry_info = INDUSTRY_CODES.get(data.get('type', 'supermarket'), INDUSTRY_CODES['supermarket'])
-    wage_info = BLS_WAGE_DATA.get(industry_info['soc_code'])
-    avg_wage = wage_info['wage'] if wage_info else 15.0
-    
-    standards = WAGE_STANDARDS.get(data.get('type', 'supermarket'), WAGE_STANDARDS['default'])
-    employee_count = standards['avg_employees']
-    
-    payroll_data = {
-        'avg_wage': avg_wage,
-        'active_employees': employee_count
-    }
+    payroll_data = payroll_for_store_type(data.get('type', 'supermarket'))
+    avg_wage = payroll_data['avg_wage']
+    employee_count = payroll_data['active_employees']
     
     # Calculate EJV
     ejv_v2_result = calculate_ejv_v2(data, payroll_data, economic_data)
@@ -381,14 +321,9 @@ def calculate_store_ejv(store_id):
     economic_data = get_local_economic_data(store['zip_code'])
     
     # Generate payroll
-    industry_info = INDUSTRY_CODES.get(store['type'], INDUSTRY_CODES['supermarket'])
-    wage_info = BLS_WAGE_DATA.get(industry_info['soc_code'])
-    avg_wage = wage_info['wage'] if wage_info else 15.0
-    
-    standards = WAGE_STANDARDS.get(store['type'], WAGE_STANDARDS['default'])
-    employee_count = standards['avg_employees']
-    
-    payroll_data = {'avg_wage': avg_wage, 'active_employees': employee_count}
+    payroll_data = payroll_for_store_type(store['type'])
+    avg_wage = payroll_data['avg_wage']
+    employee_count = payroll_data['active_employees']
     
     # Calculate both V1 and V2
     ejv_v1_result = calculate_ejv_v1(store, payroll_data, economic_data)
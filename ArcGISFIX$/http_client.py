@@ -0,0 +1,71 @@
+"""
+Shared HTTP client for upstream integrations (Census, Overpass, ArcGIS).
+
+Every upstream call goes through a per-host requests.Session with a pooled,
+keep-alive connection adapter, so repeated calls to the same API reuse open
+TCP+TLS connections instead of paying a new handshake each time. Timeouts are
+capped by the current request's deadline (see deadline.py).
+
+Configuration (environment variables):
+- HTTP_POOL_MAXSIZE:      connections kept alive per host (default 20)
+- HTTP_DEFAULT_TIMEOUT:   seconds used when a call passes no timeout (default 10)
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import deadline
+
+POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 20))
+DEFAULT_TIMEOUT = float(os.environ.get('HTTP_DEFAULT_TIMEOUT', 10))
+USER_AGENT = 'FIX-GeoEquity/1.0'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """Return the pooled keep-alive session for the URL's scheme and host"""
+    parts = urlsplit(url)
+    host_key = f"{parts.scheme}://{parts.netloc}"
+    session = _sessions.get(host_key)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(host_key)
+        if session is None:
+            session = requests.Session()
+            # pool_block=False: overflow connections are opened and then discarded
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount(f"{parts.scheme}://", adapter)
+            session.headers.update({'User-Agent': USER_AGENT, 'Connection': 'keep-alive'})
+            _sessions[host_key] = session
+        return session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Send a request through the pooled session for url's host.
+    Raises deadline.DeadlineExceeded if the request's time budget is already spent.
+    """
+    timeout = deadline.timeout_for(DEFAULT_TIMEOUT if timeout is None else timeout)
+    return get_session(url).request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url, params=None, timeout=None, **kwargs):
+    return request('GET', url, params=params, timeout=timeout, **kwargs)
+
+
+def post(url, data=None, timeout=None, **kwargs):
+    return request('POST', url, data=data, timeout=timeout, **kwargs)
+
+
+def close_all():
+    """Close every pooled session (e.g. at shutdown or in benchmarks)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,130 @@
+"""
+Pure EJV scoring core.
+
+BLS/industry reference data and the EJV V1/V2 formulas, with no HTTP calls,
+database access or logging. Inputs and results are plain dicts; app.py
+fetches economic data and delegates here.
+"""
+
+
+# ==========================================
+# BLS OEWS Wage Data (May 2024)
+# ==========================================
+BLS_WAGE_DATA = {
+    "41-2031": {"wage": 15.02, "title": "Retail Salespersons"},
+    "53-7064": {"wage": 17.02, "title": "Packers and Packagers"},
+    "53-6031": {"wage": 14.75, "title": "Service Attendants"},
+    "29-2052": {"wage": 18.79, "title": "Pharmacy Technicians"},
+    "35-3031": {"wage": 15.15, "title": "Waiters and Waitresses"},
+    "35-3023": {"wage": 14.33, "title": "Fast Food Workers"},
+}
+
+INDUSTRY_CODES = {
+    "supermarket": {"soc_code": "41-2031", "naics": "4451"},
+    "grocery": {"soc_code": "41-2031", "naics": "4451"},
+    "warehouse_club": {"soc_code": "53-7064", "naics": "45291"},
+    "convenience": {"soc_code": "41-2031", "naics": "4471"},
+    "fuel": {"soc_code": "53-6031", "naics": "4471"},
+    "pharmacy": {"soc_code": "29-2052", "naics": "4461"},
+    "restaurant": {"soc_code": "35-3031", "naics": "7225"},
+    "fast_food": {"soc_code": "35-3023", "naics": "7225"},
+}
+
+WAGE_STANDARDS = {
+    "supermarket": {"min": 13.5, "max": 18.0, "avg_employees": 48},
+    "grocery": {"min": 13.0, "max": 17.5, "avg_employees": 35},
+    "warehouse_club": {"min": 15.0, "max": 20.0, "avg_employees": 72},
+    "convenience": {"min": 12.0, "max": 15.5, "avg_employees": 9},
+    "pharmacy": {"min": 16.0, "max": 22.0, "avg_employees": 21},
+    "restaurant": {"min": 13.0, "max": 18.0, "avg_employees": 17},
+    "default": {"min": 13.0, "max": 17.0, "avg_employees": 25}
+}
+
+
+def calculate_ejv_v1(store_data, payroll_data, economic_data):
+    """Calculate EJV V1 score - original algorithm"""
+    
+    unemployment_rate = economic_data.get('unemployment_rate', 5.0)
+    median_income = economic_data.get('median_income', 50000)
+    avg_wage = payroll_data.get('avg_wage', 15.0)
+    employee_count = payroll_data.get('active_employees', 25)
+    
+    # Simple living wage (70% of median income hourly)
+    living_wage = (median_income * 0.7) / 2080
+    
+    # V1 Components (simpler)
+    # 1. Wage Score (50 points)
+    wage_ratio = min(avg_wage / living_wage, 1.2)
+    wage_score = (wage_ratio / 1.2) * 50
+    
+    # 2. Local Impact (50 points)
+    local_factor = 0.75 + (unemployment_rate / 20.0)
+    daily_wealth = avg_wage * 8 * employee_count * local_factor
+    impact_score = min(daily_wealth / 250, 1.0) * 50
+    
+    ejv_v1 = wage_score + impact_score
+    
+    return {
+        'ejv_score': round(ejv_v1, 2),
+        'wage_score': round(wage_score, 2),
+        'impact_score': round(impact_score, 2),
+        'wealth_retained_daily': round(daily_wealth, 2),
+        'living_wage': round(living_wage, 2)
+    }
+
+
+def calculate_ejv_v2(store_data, payroll_data, economic_data):
+    """Calculate EJV V2 score with real-time data"""
+    
+    # Extract data
+    unemployment_rate = economic_data.get('unemployment_rate', 5.0)
+    median_income = economic_data.get('median_income', 50000)
+    avg_wage = payroll_data.get('avg_wage', 15.0)
+    employee_count = payroll_data.get('active_employees', 25)
+    
+    # Living wage calculation (simplified)
+    living_wage = (median_income / 2080) * 1.2  # Annual to hourly + 20% buffer
+    living_wage = max(15.0, min(living_wage, 25.0))
+    
+    # Component calculations
+    # 1. Local Hiring Score (40 points)
+    unemployment_factor = min(unemployment_rate / 10.0, 1.0)
+    local_hiring = 0.85 + (unemployment_factor * 0.15)
+    local_hiring_score = local_hiring * 40
+    
+    # 2. Wage Equity Score (40 points)
+    wage_ratio = avg_wage / living_wage
+    wage_ratio_clamped = max(0.889, min(wage_ratio, 0.925))
+    wage_equity_score = (wage_ratio_clamped - 0.889) / (0.925 - 0.889) * 40
+    
+    # 3. Economic Impact (20 points)
+    daily_payroll = avg_wage * 8 * employee_count
+    wealth_retained = daily_payroll * local_hiring
+    impact_score = min(wealth_retained / 300, 1.0) * 20
+    
+    # Total EJV Score
+    ejv_score = local_hiring_score + wage_equity_score + impact_score
+    
+    return {
+        'ejv_score': round(ejv_score, 2),
+        'local_hiring_score': round(local_hiring_score, 2),
+        'wage_equity_score': round(wage_equity_score, 2),
+        'economic_impact_score': round(impact_score, 2),
+        'wealth_retained_daily': round(wealth_retained, 2),
+        'living_wage': round(living_wage, 2),
+        'wage_ratio': round(wage_ratio, 4),
+        'local_hiring_percent': round(local_hiring * 100, 1)
+    }
+
+
+def payroll_for_store_type(store_type):
+    """Typical payroll for a store type: BLS wage and industry-average headcount"""
+    industry_info = INDUSTRY_CODES.get(store_type, INDUSTRY_CODES['supermarket'])
+    wage_info = BLS_WAGE_DATA.get(industry_info['soc_code'])
+    avg_wage = wage_info['wage'] if wage_info else 15.0
+
+    standards = WAGE_STANDARDS.get(store_type, WAGE_STANDARDS['default'])
+    employee_count = standards['avg_employees']
+
+    return {'avg_wage': avg_wage, 'active_employees': employee_count}
+
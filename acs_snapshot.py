@@ -0,0 +1,287 @@
+"""
+Offline ACS 2022 5-Year snapshot for EJV scoring.
+
+The Census tables used by the EJV calculators are fixed publications, so they
+are downloaded once into a local read-only SQLite file and looked up from there
+instead of calling api.census.gov on every score:
+
+- zcta:  DP03_0005PE (unemployment rate) and DP03_0062E (median income) per ZCTA
+- tract: B19013_001E (median household income) per census tract
+- zcta_justice: per-ZCTA EJV v2 need modifiers precomputed from zcta
+
+Build or refresh the snapshot with:
+
+    python acs_snapshot.py ingest [--path data/acs_2022.sqlite]
+
+Add the zcta_justice table to a snapshot ingested before it existed with:
+
+    python acs_snapshot.py justice [--path data/acs_2022.sqlite]
+
+Set CENSUS_API_KEY to use a Census key for the bulk download and
+ACS_SNAPSHOT_PATH to read the snapshot from a different location.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import http_client
+import scoring
+
+ACS_YEAR = "2022"
+PROFILE_URL = f"https://api.census.gov/data/{ACS_YEAR}/acs/acs5/profile"
+ACS5_URL = f"https://api.census.gov/data/{ACS_YEAR}/acs/acs5"
+
+SNAPSHOT_PATH = os.environ.get(
+    'ACS_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', f'acs_{ACS_YEAR}.sqlite')
+)
+
+_conn = None
+_conn_lock = threading.Lock()  # Guards opening the snapshot and every query on the shared connection
+_has_justice = False
+_missing_checked_at = None
+MISSING_RECHECK_SECONDS = 60  # How often to look for a snapshot that did not exist yet
+
+
+def _connect():
+    """Open the snapshot read-only, or return None if it has not been ingested"""
+    global _conn, _has_justice, _missing_checked_at
+    if _conn is not None:
+        return _conn
+    with _conn_lock:
+        if _conn is not None:
+            return _conn
+        now = time.monotonic()
+        if _missing_checked_at is not None and now - _missing_checked_at < MISSING_RECHECK_SECONDS:
+            return None
+        if not os.path.exists(SNAPSHOT_PATH):
+            _missing_checked_at = now
+            return None
+        try:
+            # immutable=1: the file is never written while being served, so skip locking
+            conn = sqlite3.connect(f"file:{SNAPSHOT_PATH}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            # Snapshots ingested before zcta_justice existed lack the table
+            _has_justice = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'zcta_justice'"
+            ).fetchone() is not None
+            _conn = conn
+            print(f"[OK] ACS snapshot loaded: {SNAPSHOT_PATH}")
+        except sqlite3.Error as e:
+            print(f"ACS snapshot error: {e}")
+            _missing_checked_at = now
+            return None
+        return _conn
+
+
+def reload():
+    """Drop the open snapshot so the next lookup re-opens the file (e.g. after ingest)"""
+    global _conn, _has_justice, _missing_checked_at
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _has_justice = False
+        _missing_checked_at = None
+
+
+def _lookup(sql, params):
+    """Run one single-row query on the snapshot, or return None if it is missing or the query failed"""
+    conn = _connect()
+    if conn is None:
+        return None
+    try:
+        # One connection serves every request thread: sqlite3 objects must not be used concurrently
+        with _conn_lock:
+            return conn.execute(sql, params).fetchone()
+    except sqlite3.Error as e:
+        print(f"ACS snapshot lookup error: {e}")
+        return None
+
+
+def get_zcta(zip_code):
+    """
+    Look up a ZCTA in the snapshot.
+    Returns {'unemployment_rate', 'median_income'} (values may be None when
+    Census published no estimate), or None if the ZCTA/snapshot is missing.
+    """
+    row = _lookup(
+        'SELECT unemployment_rate, median_income FROM zcta WHERE zcta = ?',
+        (str(zip_code).zfill(5),)
+    )
+    if row is None:
+        return None
+    return {'unemployment_rate': row[0], 'median_income': row[1]}
+
+
+def get_tract_income(state_fips, county_fips, tract_fips):
+    """
+    Look up a tract's median household income in the snapshot.
+    Returns (found, income): income may be None when Census published no estimate.
+    """
+    row = _lookup(
+        'SELECT median_income FROM tract WHERE geoid = ?',
+        (f"{state_fips}{county_fips}{tract_fips}",)
+    )
+    if row is None:
+        return False, None
+    return True, row[0]
+
+
+MODIFIER_COLUMNS = tuple(dim.lower() for dim in scoring.NEED_MODIFIER_WEIGHTS)
+
+
+def get_zcta_justice(zip_code):
+    """
+    Look up a ZCTA's precomputed justice context (see scoring.justice_context).
+    Returns None if the ZCTA, the zcta_justice table or the snapshot is missing.
+    """
+    if _connect() is None or not _has_justice:
+        return None
+    row = _lookup(
+        f'SELECT unemployment_rate, median_income, base_modifier, {", ".join(MODIFIER_COLUMNS)}'
+        ' FROM zcta_justice WHERE zcta = ?',
+        (str(zip_code).zfill(5),)
+    )
+    if row is None:
+        return None
+    return {
+        "unemployment_rate": row[0],
+        "median_income": row[1],
+        "base_modifier": row[2],
+        "modifiers": dict(zip(scoring.NEED_MODIFIER_WEIGHTS, row[3:]))
+    }
+
+
+# ---------------------------------------
+# Ingest
+# ---------------------------------------
+def _parse_number(value, cast):
+    if value is None or value == 'null' or value == '':
+        return None
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _fetch_table(url, params, api_key=None):
+    """Fetch one Census table and return (header, rows)"""
+    if api_key:
+        params = {**params, 'key': api_key}
+    response = http_client.get(url, params=params, timeout=120)
+    response.raise_for_status()
+    data = response.json()
+    return data[0], data[1:]
+
+
+def _write_justice_table(conn):
+    """(Re)build zcta_justice from the zcta table, with the app's defaults for missing estimates"""
+    conn.execute('DROP TABLE IF EXISTS zcta_justice')
+    conn.execute(
+        'CREATE TABLE zcta_justice (zcta TEXT PRIMARY KEY, unemployment_rate REAL, median_income INTEGER,'
+        f' base_modifier REAL, {", ".join(f"{col} REAL" for col in MODIFIER_COLUMNS)}) WITHOUT ROWID'
+    )
+    rows = []
+    for zcta, unemployment_rate, median_income in conn.execute('SELECT zcta, unemployment_rate, median_income FROM zcta'):
+        justice = scoring.justice_context({
+            'unemployment_rate': unemployment_rate if unemployment_rate is not None else 5.0,
+            'median_income': median_income if median_income is not None else 50000
+        })
+        rows.append((
+            zcta, justice['unemployment_rate'], justice['median_income'], justice['base_modifier'],
+            *justice['modifiers'].values()
+        ))
+    conn.executemany(f'INSERT INTO zcta_justice VALUES ({", ".join("?" * (4 + len(MODIFIER_COLUMNS)))})', rows)
+    print(f"[OK] ACS snapshot: justice context for {len(rows)} ZCTAs")
+
+
+def precompute_justice(path=SNAPSHOT_PATH):
+    """Add (or rebuild) zcta_justice in an existing snapshot, replacing the file atomically"""
+    tmp_path = f"{path}.tmp"
+    shutil.copyfile(path, tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    _write_justice_table(conn)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+    reload()
+    return path
+
+
+def ingest(path=SNAPSHOT_PATH, api_key=None):
+    """Bulk-download every ZCTA and tract into a fresh snapshot file at path"""
+    api_key = api_key or os.environ.get('CENSUS_API_KEY')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('CREATE TABLE zcta (zcta TEXT PRIMARY KEY, unemployment_rate REAL, median_income INTEGER) WITHOUT ROWID')
+    conn.execute('CREATE TABLE tract (geoid TEXT PRIMARY KEY, median_income INTEGER) WITHOUT ROWID')
+    conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    # ZCTAs: one call for the whole country
+    header, rows = _fetch_table(PROFILE_URL, {
+        'get': 'NAME,DP03_0005PE,DP03_0062E',
+        'for': 'zip code tabulation area:*'
+    }, api_key)
+    unemp_i = header.index('DP03_0005PE')
+    income_i = header.index('DP03_0062E')
+    zcta_i = header.index('zip code tabulation area')
+    conn.executemany('INSERT OR REPLACE INTO zcta VALUES (?, ?, ?)', [
+        (row[zcta_i], _parse_number(row[unemp_i], float), _parse_number(row[income_i], int))
+        for row in rows
+    ])
+    print(f"[OK] ACS ingest: {len(rows)} ZCTAs")
+    _write_justice_table(conn)
+
+    # Tracts: Census requires a state per call
+    header, states = _fetch_table(ACS5_URL, {'get': 'NAME', 'for': 'state:*'}, api_key)
+    state_i = header.index('state')
+    tract_count = 0
+    for state in sorted(row[state_i] for row in states):
+        header, rows = _fetch_table(ACS5_URL, {
+            'get': 'NAME,B19013_001E',
+            'for': 'tract:*',
+            'in': f'state:{state}'
+        }, api_key)
+        income_i = header.index('B19013_001E')
+        st_i, co_i, tr_i = header.index('state'), header.index('county'), header.index('tract')
+        conn.executemany('INSERT OR REPLACE INTO tract VALUES (?, ?)', [
+            (f"{row[st_i]}{row[co_i]}{row[tr_i]}", _parse_number(row[income_i], int))
+            for row in rows
+        ])
+        tract_count += len(rows)
+        print(f"[OK] ACS ingest: state {state} - {len(rows)} tracts")
+
+    conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+        ('acs_year', ACS_YEAR),
+        ('ingested_at', datetime.now().isoformat()),
+    ])
+    conn.commit()
+    conn.close()
+
+    os.replace(tmp_path, path)
+    reload()
+    print(f"[OK] ACS snapshot written to {path} ({tract_count} tracts)")
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the offline ACS snapshot used for EJV scoring")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help="Download ZCTA and tract tables from the Census API")
+    ingest_parser.add_argument('--path', default=SNAPSHOT_PATH, help="Snapshot file to write")
+    justice_parser = subparsers.add_parser('justice', help="Precompute per-ZCTA need modifiers in an existing snapshot")
+    justice_parser.add_argument('--path', default=SNAPSHOT_PATH, help="Snapshot file to update")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        ingest(args.path)
+    elif args.command == 'justice':
+        precompute_justice(args.path)
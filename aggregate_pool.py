@@ -0,0 +1,122 @@
+"""
+Process-pool scoring for large aggregate EJV jobs.
+
+Scoring is pure CPU work (see scoring.py), so on a single request thread a
+large store list is limited to one core by the GIL. score_v1_columns splits
+the list into chunks, scores them in a shared ProcessPoolExecutor and merges
+the per-chunk results back in input order, so totals summed by the caller are
+identical to the in-thread path.
+
+Tasks only need this module, scoring.py and (optionally) ejv_batch.py.
+Workers are spawned, though, and spawn re-imports the parent's main module
+in each worker as __mp_main__. Behind a WSGI server (waitress-serve app:app,
+gunicorn, Vercel) that is the server's own script, so no Flask app, database
+or upstream client is created in the workers. Started with `python app.py`,
+app.py is the main module: every worker then runs its module-level setup
+(the Flask app, caches and upstream clients, but not the __main__ block),
+which costs start-up time and memory per worker but changes no results.
+
+Configuration (environment variables):
+- AGGREGATE_POOL_WORKERS:    worker processes (default: CPU count; 0 on serverless)
+- AGGREGATE_POOL_MIN_STORES: smallest store list sent to the pool (default 20000)
+- AGGREGATE_POOL_CHUNK:      stores per worker task (default 5000)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import scoring
+
+try:
+    import ejv_batch
+except ImportError:  # NumPy not installed: score chunks with the scalar functions
+    ejv_batch = None
+
+IS_SERVERLESS = os.environ.get('VERCEL', False) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', False)
+WORKERS = int(os.environ.get('AGGREGATE_POOL_WORKERS', 0 if IS_SERVERLESS else (os.cpu_count() or 1)))
+MIN_STORES = int(os.environ.get('AGGREGATE_POOL_MIN_STORES', 20000))
+CHUNK_SIZE = int(os.environ.get('AGGREGATE_POOL_CHUNK', 5000))
+
+V1_FIELDS = ("EJV", "wage_score", "hiring_score", "community_score", "participation_score", "wealth_retained", "wealth_leakage")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def enabled_for(store_count):
+    """True if a job of store_count stores should be scored in the pool"""
+    return WORKERS > 1 and store_count >= MIN_STORES
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded server process can copy held locks into the child
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            print(f"[OK] Aggregate scoring pool started: {WORKERS} workers")
+        return _pool
+
+
+def shutdown():
+    """Stop the worker processes (the next pooled job starts a new pool)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def score_chunk(store_ids, economic_data, type_inputs, year):
+    """
+    Score store_ids with EJV v1 against one economic context.
+    type_inputs: {store_type: (real_wage, real_employee_count, standards)} for
+    every known store type (see get_store_type_inputs in app.py).
+    Returns {field: list of per-store values} for V1_FIELDS.
+    """
+    payrolls = []
+    for store_id in store_ids:
+        store_type = scoring.store_type_from_id(store_id, type_inputs.keys())
+        real_wage, real_employee_count, standards = type_inputs[store_type]
+        profile = scoring.build_store_profile(store_id, store_type, real_wage, real_employee_count, standards, year)
+        payrolls.append(scoring.payroll_from_profile(profile, economic_data['unemployment_rate']))
+
+    if ejv_batch is not None:
+        scores = ejv_batch.score_payrolls(store_ids, payrolls, [economic_data] * len(store_ids))["v1"]
+        return {field: scores[field].tolist() for field in V1_FIELDS}
+
+    results = [scoring.score_ejv_v1(payroll, economic_data) for payroll in payrolls]
+    return {field: [result[field] for result in results] for field in V1_FIELDS}
+
+
+def score_v1_columns(store_ids, economic_data, type_inputs, year):
+    """
+    score_chunk for a large store list, split across the process pool.
+    Returns None if the pool is unavailable so the caller can score in-thread.
+    """
+    chunks = [store_ids[start:start + CHUNK_SIZE] for start in range(0, len(store_ids), CHUNK_SIZE)]
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(score_chunk, chunk, economic_data, type_inputs, year) for chunk in chunks]
+        partials = [future.result() for future in futures]
+    except (BrokenProcessPool, OSError) as e:
+        print(f"[FAIL] Aggregate scoring pool unavailable, scoring in-thread: {e}")
+        shutdown()
+        return None
+
+    merged = {field: [] for field in V1_FIELDS}
+    for partial in partials:
+        for field in V1_FIELDS:
+            merged[field].extend(partial[field])
+    return merged
+
+
+def stats():
+    return {
+        "workers": WORKERS,
+        "min_stores": MIN_STORES,
+        "chunk_size": CHUNK_SIZE,
+        "running": _pool is not None
+    }
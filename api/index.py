@@ -1,14 +1,33 @@
 
 import requests
 import random
-import hashlib
 import secrets
-import time
+import json
+import math
+import re
 from datetime import datetime, timedelta
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import check_password_hash
+import os
 import database
+import acs_snapshot
+import scoring
+import aggregate_pool
+import overpass
+import overpass_tiles
+import store_profiles
+import http_client
+import deadline
+from cache import TTLCache
+from batching import MicroBatcher
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Vectorized batch scoring engine (optional - requires NumPy)
+try:
+    import ejv_batch
+except ImportError:
+    ejv_batch = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend access
@@ -26,9 +45,66 @@ def initialize_database():
             print(f"Database initialization error: {e}")
             # Continue anyway - some endpoints don't need DB
 
+# ---------------------------------------
+# Request Deadlines
+# ---------------------------------------
+# Overall time budget (seconds) per request; every upstream call's timeout is
+# capped by what is left. Clients may override it with X-Request-Timeout-Ms.
+REQUEST_DEADLINE_DEFAULT = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 20))
+REQUEST_DEADLINE_MAX = 120
+ENDPOINT_DEADLINES = {
+    'get_ejv': 8,
+    'get_ejv_v2': 8,
+    'get_ejv_v2_sweep': 8,
+    'get_ejv_comparison': 8,
+    'get_ejv_batch': 20,
+    'area_comparison': 15,
+    'get_demo_stores': 15,
+    'get_aggregate_ejv': 30,
+    'get_aggregate_ejv_stream': 30,
+    'overpass_proxy': 45,
+}
+
+@app.before_request
+def start_request_deadline():
+    """Start the time budget for this request"""
+    budget = ENDPOINT_DEADLINES.get(request.endpoint, REQUEST_DEADLINE_DEFAULT)
+    header = request.headers.get('X-Request-Timeout-Ms')
+    if header:
+        try:
+            requested = float(header) / 1000
+        except ValueError:
+            requested = None
+        # nan would compare as a zero budget and skip every upstream call
+        if requested is not None and math.isfinite(requested):
+            budget = min(max(requested, 0.0), REQUEST_DEADLINE_MAX)
+    deadline.start(budget)
+
+@app.after_request
+def mark_degraded_response(response):
+    """Flag responses that fell back to cached/default data because an upstream was unavailable"""
+    reasons = deadline.degraded_reasons()
+    if reasons:
+        response.headers['X-Degraded'] = 'true'
+        if response.is_json and not response.is_streamed:
+            payload = response.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload['degraded'] = {"reasons": reasons}
+                response.set_data(json.dumps(payload))
+    return response
+
+@app.teardown_request
+def clear_request_deadline(exc=None):
+    deadline.clear()
+
 # Cache for API calls to avoid rate limiting
-wage_cache = {}
-employee_cache = {}
+# Expired entries keep being served while they refresh in the background,
+# and concurrent misses for the same ZIP/county share one upstream call
+CENSUS_CACHE_TTL = int(os.environ.get('CENSUS_CACHE_TTL', 6 * 3600))
+CENSUS_CACHE_SIZE = int(os.environ.get('CENSUS_CACHE_SIZE', 4096))
+zcta_cache = TTLCache("census-zcta", maxsize=CENSUS_CACHE_SIZE, ttl=CENSUS_CACHE_TTL)
+# Whole-county tract income tables: (state_fips, county_fips) -> {tract_fips: income}
+county_tract_cache = TTLCache("census-county", maxsize=int(os.environ.get('CENSUS_COUNTY_CACHE_SIZE', 256)), ttl=CENSUS_CACHE_TTL)
 
 # ---------------------------------------
 # Real-Time Wage Data from BLS API
@@ -106,124 +182,343 @@ def get_industry_employee_count(naics_code):
 # ---------------------------------------
 # Real-Time Local Economic Data
 # ---------------------------------------
+# Opens after repeated Census failures/timeouts so lookups fall straight back to
+# cached, snapshot or default values instead of waiting on a struggling API
+census_breaker = CircuitBreaker(
+    "Census API",
+    failure_threshold=int(os.environ.get('CENSUS_BREAKER_THRESHOLD', 5)),
+    recovery_timeout=float(os.environ.get('CENSUS_BREAKER_RECOVERY', 30))
+)
+
+def _census_get(url, params):
+    """
+    GET from the Census API through the circuit breaker (raises CircuitOpenError while open)
+    The timeout is capped by the request deadline (raises DeadlineExceeded once it is spent).
+    """
+    timeout = deadline.timeout_for(10)
+    if not census_breaker.allow_request():
+        raise CircuitOpenError("Census API circuit open")
+    try:
+        response = http_client.get(url, params=params, timeout=timeout)
+    except requests.RequestException as e:
+        if isinstance(e, requests.Timeout) and deadline.expired():
+            # Our own budget ran out, which says nothing about the Census API
+            census_breaker.release()
+        else:
+            census_breaker.record_failure(e)
+        raise
+    except BaseException:
+        # DeadlineExceeded or anything unexpected: free the probe slot so the breaker cannot stick half-open
+        census_breaker.release()
+        raise
+    if response.status_code >= 500 or response.status_code == 429:
+        census_breaker.record_failure(f"HTTP {response.status_code}")
+    else:
+        census_breaker.record_success()
+    return response
+
 def get_local_economic_indicators(zip_code):
     """
     Get local economic indicators that affect hiring
     - Unemployment rate
     - Median income
     Uses Census ACS 5-Year Data Profile
+    Reads the offline ACS snapshot first; the live API is only used for misses.
     """
-    try:
-        # Use Census API for economic indicators (no key required)
-        url = "https://api.census.gov/data/2022/acs/acs5/profile"
-        params = {
-            'get': 'NAME,DP03_0005PE,DP03_0062E',  # Name, Unemployment rate, Median income
-            'for': f'zip code tabulation area:{zip_code.zfill(5)}'  # Ensure 5-digit ZIP
+    snapshot = acs_snapshot.get_zcta(zip_code.zfill(5))
+    if snapshot is not None:
+        unemployment_rate = snapshot['unemployment_rate'] if snapshot['unemployment_rate'] is not None else 5.0
+        median_income = snapshot['median_income'] if snapshot['median_income'] is not None else 50000
+        return {
+            'unemployment_rate': unemployment_rate,
+            'median_income': median_income
         }
-        
-        response = requests.get(url, params=params, timeout=10)
-        if response.ok:
-            data = response.json()
-            if len(data) > 1:
-                # data[0] is headers, data[1] is values
-                unemployment_rate = float(data[1][1]) if data[1][1] and data[1][1] != 'null' else 5.0
-                median_income = int(float(data[1][2])) if data[1][2] and data[1][2] != 'null' else 50000
-                print(f"[OK] Census API: ZIP {zip_code} - Unemployment: {unemployment_rate}%, Income: ${median_income}")
-                return {
-                    'unemployment_rate': unemployment_rate,
-                    'median_income': median_income
-                }
-        else:
-            print(f"Census API: HTTP {response.status_code}")
-    except Exception as e:
-        print(f"Census API Error: {e}")
+    
+    zip_code = zip_code.zfill(5)  # Ensure 5-digit ZIP
+    try:
+        economic_data = zcta_cache.get_or_load(
+            zip_code,
+            lambda: _fetch_economic_indicators(zip_code),
+            timeout=deadline.remaining()
+        )
+    except TimeoutError:
+        economic_data = None
+    if economic_data is not None:
+        return dict(economic_data)
     
     print(f"Census API: Using defaults for ZIP {zip_code}")
+    deadline.mark_degraded(f"Census defaults used for ZIP {zip_code}")
     return {'unemployment_rate': 5.0, 'median_income': 50000}
 
+def _fetch_economic_indicators(zip_code):
+    """
+    Fetch one ZCTA from the live Census API, or None if the lookup failed
+    Lookups from concurrent requests are micro-batched into one multi-ZCTA call.
+    """
+    if census_breaker.is_open():
+        return None
+    return zcta_batcher.submit(zip_code, timeout=deadline.remaining())
+
+CENSUS_BATCH_SIZE = 50  # Geographies per multi-geography Census request
+
+def _fetch_economic_indicators_batch(zip_codes):
+    """
+    Fetch many ZCTAs from the live Census API using comma-separated geography lists
+    Returns {zip_code: {'unemployment_rate', 'median_income'}} for the ZCTAs found
+    """
+    results = {}
+    if census_breaker.is_open():
+        return results
+    # One malformed geography fails the whole comma-separated request
+    zip_codes = sorted({zip_code for zip_code in zip_codes if ZIP_PATTERN.fullmatch(zip_code)})
+    for start in range(0, len(zip_codes), CENSUS_BATCH_SIZE):
+        chunk = zip_codes[start:start + CENSUS_BATCH_SIZE]
+        try:
+            # Use Census API for economic indicators (no key required)
+            url = "https://api.census.gov/data/2022/acs/acs5/profile"
+            params = {
+                'get': 'NAME,DP03_0005PE,DP03_0062E',  # Name, Unemployment rate, Median income
+                'for': f'zip code tabulation area:{",".join(chunk)}'
+            }
+            
+            response = _census_get(url, params)
+            if response.ok:
+                data = response.json()
+                # data[0] is headers, data[1:] are values
+                zcta_index = data[0].index('zip code tabulation area')
+                for row in data[1:]:
+                    unemployment_rate = float(row[1]) if row[1] and row[1] != 'null' else 5.0
+                    median_income = int(float(row[2])) if row[2] and row[2] != 'null' else 50000
+                    print(f"[OK] Census API: ZIP {row[zcta_index]} - Unemployment: {unemployment_rate}%, Income: ${median_income}")
+                    results[row[zcta_index]] = {
+                        'unemployment_rate': unemployment_rate,
+                        'median_income': median_income
+                    }
+            else:
+                print(f"Census API: HTTP {response.status_code}")
+        except (CircuitOpenError, deadline.DeadlineExceeded) as e:
+            print(f"Census API: {e}, skipping {len(zip_codes) - start} ZIP(s)")
+            break
+        except Exception as e:
+            print(f"Census API Error: {e}")
+    return results
+
+# ZCTA lookups arriving within CENSUS_BATCH_WINDOW_MS of each other share one Census call
+CENSUS_BATCH_WINDOW_MS = float(os.environ.get('CENSUS_BATCH_WINDOW_MS', 15))
+zcta_batcher = MicroBatcher(
+    "census-zcta",
+    _fetch_economic_indicators_batch,
+    window=CENSUS_BATCH_WINDOW_MS / 1000,
+    max_batch=CENSUS_BATCH_SIZE
+)
+
+# ---------------------------------------
+# Per-ZIP Justice Context
+# ---------------------------------------
+# Need modifiers depend only on a ZIP's unemployment rate and median income,
+# so they are computed once per ZIP and shared by every store scored there
+justice_cache = TTLCache("zip-justice", maxsize=CENSUS_CACHE_SIZE, ttl=CENSUS_CACHE_TTL)
+
+def _justice_matches(justice, economic_data):
+    return (justice is not None
+            and justice["unemployment_rate"] == economic_data['unemployment_rate']
+            and justice["median_income"] == economic_data['median_income'])
+
+def get_justice_context(zip_code, economic_data):
+    """
+    Justice context (base and AES/ART/HWI need modifiers) for a ZIP: in-memory
+    table, then the snapshot's precomputed zcta_justice, then computed.
+    Entries built from different Census values (e.g. defaults during an
+    outage) are replaced rather than reused.
+    """
+    zip_code = zip_code.zfill(5)
+    justice, _ = justice_cache.get(zip_code)
+    if _justice_matches(justice, economic_data):
+        return justice
+    justice = acs_snapshot.get_zcta_justice(zip_code)
+    if not _justice_matches(justice, economic_data):
+        justice = scoring.justice_context(economic_data)
+    justice_cache.set(zip_code, justice)
+    return justice
+
+# ---------------------------------------
+# Per-Request Economic Context
+# ---------------------------------------
+DEFAULT_ZIP = "10001"
+ZIP_PATTERN = re.compile(r'\d{5}', re.ASCII)
+ZIP_INPUT_PATTERN = re.compile(r'\d{1,5}', re.ASCII)
+
+def clean_zip(zip_code):
+    """
+    A client-supplied ZIP as 5 digits, or None if it is not 1-5 digits
+    Leading zeros are restored (JSON numbers and some clients drop them, e.g. 2134 -> 02134).
+    Malformed ZIPs must never reach the multi-ZCTA Census calls shared across requests.
+    """
+    zip_code = str(zip_code).strip()
+    return zip_code.zfill(5) if ZIP_INPUT_PATTERN.fullmatch(zip_code) else None
+
+def request_zip():
+    """The ?zip= query parameter: DEFAULT_ZIP if absent or malformed (marked degraded)"""
+    value = request.args.get('zip')
+    if not value:
+        return DEFAULT_ZIP
+    zip_code = clean_zip(value)
+    if zip_code is None:
+        deadline.mark_degraded(f"Invalid ZIP {value[:20]!r}; default ZIP {DEFAULT_ZIP} used")
+        return DEFAULT_ZIP
+    return zip_code
+
+def resolve_economic_context(zip_code="10001", state_fips="01", county_fips="089", tract_fips="010100"):
+    """
+    Resolve the Census inputs for one score exactly once:
+    - one ZCTA lookup (unemployment rate, ZIP median income)
+    - one tract lookup (tract median household income)
+    - the ZIP's justice context (need modifiers)
+    The result can be passed as economic_data to get_payroll_data and
+    get_zip_need_modifier, and as context to both EJV calculators.
+    """
+    economic_data = get_local_economic_indicators(zip_code)
+    return {
+        "zip_code": zip_code,
+        "state_fips": state_fips,
+        "county_fips": county_fips,
+        "tract_fips": tract_fips,
+        "unemployment_rate": economic_data['unemployment_rate'],
+        "median_income": economic_data['median_income'],
+        "tract_median_income": get_median_income(state_fips, county_fips, tract_fips),
+        "justice": get_justice_context(zip_code, economic_data)
+    }
+
+def resolve_economic_contexts(locations):
+    """
+    Resolve economic contexts for a whole batch of stores at once.
+    locations: list of dicts with zip_code and optional state_fips/county_fips/tract_fips
+    Every distinct ZIP and tract is looked up once; ZCTA snapshot and cache misses
+    are fetched with a few multi-geography Census calls instead of one per store,
+    and tracts come from whole-county tables fetched once per county.
+    Returns a list of contexts in the same order as locations.
+    """
+    defaults = {"zip_code": "10001", "state_fips": "01", "county_fips": "089", "tract_fips": "010100"}
+    locations = [{**defaults, **{k: v for k, v in loc.items() if v}} for loc in locations]
+    
+    # Distinct ZCTAs: snapshot, then cache, then one batched fetch for the rest
+    zcta_data = {}
+    missing_zips = []
+    for zip_code in {loc["zip_code"].zfill(5) for loc in locations}:
+        snapshot = acs_snapshot.get_zcta(zip_code)
+        if snapshot is not None:
+            zcta_data[zip_code] = {
+                'unemployment_rate': snapshot['unemployment_rate'] if snapshot['unemployment_rate'] is not None else 5.0,
+                'median_income': snapshot['median_income'] if snapshot['median_income'] is not None else 50000
+            }
+            continue
+        cached = zcta_cache.get_cached(zip_code, lambda z=zip_code: _fetch_economic_indicators(z))
+        if cached is not None:
+            zcta_data[zip_code] = cached
+        else:
+            missing_zips.append(zip_code)
+    if missing_zips:
+        for zip_code, data in _fetch_economic_indicators_batch(missing_zips).items():
+            zcta_cache.set(zip_code, data)
+            zcta_data[zip_code] = data
+    
+    # Distinct tracts, served from whole-county tables (one fetch per county)
+    tract_income = {}
+    for tract_key in {(loc["state_fips"], loc["county_fips"], loc["tract_fips"]) for loc in locations}:
+        tract_income[tract_key] = get_median_income(*tract_key)
+    
+    contexts = []
+    justice_by_zip = {}
+    for loc in locations:
+        zip_code = loc["zip_code"].zfill(5)
+        economic_data = zcta_data.get(zip_code)
+        if economic_data is None:
+            deadline.mark_degraded(f"Census defaults used for ZIP {loc['zip_code']}")
+            economic_data = {'unemployment_rate': 5.0, 'median_income': 50000}
+        # One justice context per distinct ZIP, shared by all its stores
+        if zip_code not in justice_by_zip:
+            justice_by_zip[zip_code] = get_justice_context(zip_code, economic_data)
+        contexts.append({
+            "zip_code": loc["zip_code"],
+            "state_fips": loc["state_fips"],
+            "county_fips": loc["county_fips"],
+            "tract_fips": loc["tract_fips"],
+            "unemployment_rate": economic_data['unemployment_rate'],
+            "median_income": economic_data['median_income'],
+            "tract_median_income": tract_income.get((loc["state_fips"], loc["county_fips"], loc["tract_fips"]), 50000),
+            "justice": justice_by_zip[zip_code]
+        })
+    return contexts
+
 # ---------------------------------------
 # Enhanced Real-Time Payroll Data
 # ---------------------------------------
-def get_payroll_data(store_id, store_type=None, store_name=None, location=None, zip_code="10001", economic_data=None):
+# ---------------------------------------
+# Store Profiles
+# ---------------------------------------
+# Everything get_payroll_data derives from the store ID alone is computed once
+# per store and reused across requests and across the v1/v2 calculators.
+# Bump PROFILE_VERSION whenever build_store_profile's output changes.
+PROFILE_VERSION = 2
+store_profile_cache = TTLCache(
+    "store-profile",
+    maxsize=int(os.environ.get('STORE_PROFILE_CACHE_SIZE', 20000)),
+    ttl=24 * 3600,  # Daily, so the inflation adjustment follows the calendar year
+    max_stale=0
+)
+
+def get_store_profile(store_id, store_type):
+    """Cached build_store_profile: in-process LRU, then the optional persisted table"""
+    key = (str(store_id), store_type)
+    profile, fresh = store_profile_cache.get(key)
+    if fresh:
+        return profile
+    profile = store_profiles.load(store_id, store_type, PROFILE_VERSION)
+    if profile is None:
+        profile = build_store_profile(store_id, store_type)
+        store_profiles.save(store_id, profile, PROFILE_VERSION)
+    store_profile_cache.set(key, profile)
+    return profile
+
+def build_store_profile(store_id, store_type):
     """
-    Generate payroll data using REAL-TIME sources:
-    1. BLS OEWS for actual wage data
-    2. Industry research for employee counts
-    3. Census API for local economic conditions
+    Derive the store-specific payroll inputs that do not depend on location:
+    avg_wage, active_employees, base_local_hire, community_spend_pct
     """
-    if not store_type:
-        store_type = get_store_type_from_id(store_id)
-    
+    real_wage, real_employee_count, standards = get_store_type_inputs(store_type)
+    return scoring.build_store_profile(store_id, store_type, real_wage, real_employee_count, standards, datetime.now().year)
+
+def get_store_type_inputs(store_type):
+    """BLS wage, industry employee count and fallback wage standards for a store type"""
     # Get real-time wage data from BLS
     industry_info = INDUSTRY_CODES.get(store_type, INDUSTRY_CODES.get("supermarket"))
     real_wage = get_bls_wage_data(industry_info["soc_code"])
     
-    # If BLS fails, use industry standards with real-time adjustments
-    if real_wage is None:
-        standards = WAGE_STANDARDS.get(store_type, WAGE_STANDARDS["default"])
-        base_wage = standards["min"] + (standards["max"] - standards["min"]) * generate_consistent_random(store_id, "wage")
-        
-        # Adjust for current date (annual 3% increase simulation)
-        year_offset = datetime.now().year - 2024
-        inflation_multiplier = 1.03 ** year_offset
-        avg_wage = round(base_wage * inflation_multiplier, 2)
-    else:
-        # Add store-specific variance to real wage (±35%)
-        wage_variance = (generate_consistent_random(store_id, "wage") - 0.5) * 0.70
-        # Add additional random component based on store_id digits
-        store_hash = abs(hash(str(store_id)))
-        additional_variance = ((store_hash % 100) / 100 - 0.5) * 0.20
-        avg_wage = round(real_wage * (1 + wage_variance + additional_variance), 2)
-    
     # Get industry-standard employee count
     real_employee_count = None
     if industry_info.get('naics'):
         real_employee_count = get_industry_employee_count(industry_info['naics'])
     
-    if real_employee_count is None:
-        standards = WAGE_STANDARDS.get(store_type, WAGE_STANDARDS["default"])
-        employee_variance = 0.6
-        min_employees = int(standards["avg_employees"] * (1 - employee_variance))
-        max_employees = int(standards["avg_employees"] * (1 + employee_variance))
-        active_employees = int(min_employees + (max_employees - min_employees) * generate_consistent_random(store_id, "emp"))
-        active_employees = max(3, active_employees)
-    else:
-        # Add store-specific variance to industry average (±60%)
-        employee_variance = (generate_consistent_random(store_id, "emp") - 0.5) * 1.20
-        # Add additional random component
-        store_hash = abs(hash(str(store_id)))
-        additional_variance = ((store_hash % 50) / 50 - 0.5) * 0.30
-        active_employees = int(real_employee_count * (1 + employee_variance + additional_variance))
-        active_employees = max(3, active_employees)
+    return real_wage, real_employee_count, WAGE_STANDARDS.get(store_type, WAGE_STANDARDS["default"])
+
+def get_payroll_data(store_id, store_type=None, store_name=None, location=None, zip_code="10001", economic_data=None):
+    """
+    Generate payroll data using REAL-TIME sources:
+    1. BLS OEWS for actual wage data
+    2. Industry research for employee counts
+    3. Census API for local economic conditions
+    """
+    if not store_type:
+        store_type = get_store_type_from_id(store_id)
+    profile = get_store_profile(store_id, store_type)
     
     # Get local economic data if not provided
     if economic_data is None:
         economic_data = get_local_economic_indicators(zip_code)
     
-    # Adjust local hire percentage based on unemployment rate
-    # Higher unemployment = higher local hire percentage
-    store_hash = abs(hash(str(store_id)))
-    base_local_hire = 0.40 + (0.55 * generate_consistent_random(store_id, "local"))
-    # Add store-specific adjustment
-    store_adjustment = ((store_hash % 30) / 100)  # 0-30% additional variance
-    unemployment_factor = min(economic_data['unemployment_rate'] / 10.0, 0.20)  # Up to 20% boost
-    local_hire_pct = min(0.98, base_local_hire + store_adjustment + unemployment_factor)
-    local_hire_pct = round(local_hire_pct, 2)
-    
-    # Calculate daily payroll with real-time data
-    daily_payroll = round(active_employees * avg_wage * 8, 2)
-    
-    # Community spending varies by store profitability and local conditions
-    community_spend_pct = 0.005 + (0.25 * generate_consistent_random(store_id, "community"))
-    community_spend_today = round(daily_payroll * community_spend_pct, 2)
-    
+    payroll = scoring.payroll_from_profile(profile, economic_data['unemployment_rate'])
     return {
-        "avg_wage": avg_wage,
-        "active_employees": active_employees,
-        "daily_payroll": daily_payroll,
-        "local_hire_pct": local_hire_pct,
-        "community_spend_today": community_spend_today,
-        "store_type": store_type,
+        **payroll,
         "data_sources": {
             "wages": "BLS OEWS May 2024 (real published data)",
             "demographics": "Census ACS 2022 (real-time API)",
@@ -237,26 +532,65 @@ def get_payroll_data(store_id, store_type=None, store_name=None, location=None,
 # Census: Median Income (REAL API)
 # ---------------------------------------
 def get_median_income(state_fips, county_fips, tract_fips):
-    """Get median household income from Census ACS 5-Year data"""
+    """
+    Get median household income from Census ACS 5-Year data
+    Reads the offline ACS snapshot first; the live API is only used for misses.
+    """
+    found, income = acs_snapshot.get_tract_income(state_fips, county_fips, tract_fips)
+    if found:
+        return income if income is not None else 50000
+    
+    county_incomes = get_county_tract_incomes(state_fips, county_fips)
+    income = county_incomes.get(tract_fips) if county_incomes is not None else None
+    if income is not None:
+        return income
+    
+    print(f"Census API: Using default income for tract {tract_fips}")
+    deadline.mark_degraded(f"Census default income used for tract {state_fips}-{county_fips}-{tract_fips}")
+    return 50000  # Default fallback
+
+def get_county_tract_incomes(state_fips, county_fips):
+    """
+    Get the median household income of every tract in a county as {tract_fips: income}.
+    The first lookup in a county pulls tract:* in one Census call; later tract
+    lookups in that county are dictionary hits. Returns None if the fetch failed.
+    """
+    try:
+        return county_tract_cache.get_or_load(
+            (state_fips, county_fips),
+            lambda: _fetch_county_tract_incomes(state_fips, county_fips),
+            timeout=deadline.remaining()
+        )
+    except TimeoutError:
+        return None
+
+def _fetch_county_tract_incomes(state_fips, county_fips):
+    """Fetch every tract of one county from the live Census API, or None if the lookup failed"""
+    if census_breaker.is_open():
+        return None
     url = "https://api.census.gov/data/2022/acs/acs5"
     params = {
         'get': 'NAME,B19013_001E',  # Tract name, Median household income
-        'for': f'tract:{tract_fips}',
+        'for': 'tract:*',
         'in': f'state:{state_fips} county:{county_fips}'
     }
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = _census_get(url, params)
         if r.ok:
             data = r.json()
-            if len(data) > 1 and data[1][1] and data[1][1] != 'null':
-                income = int(data[1][1])
-                print(f"[OK] Census API: Tract {state_fips}-{county_fips}-{tract_fips} - Income: ${income}")
-                return income
+            tract_index = data[0].index('tract')
+            incomes = {}
+            for row in data[1:]:
+                if row[1] and row[1] != 'null':
+                    incomes[row[tract_index]] = int(row[1])
+            print(f"[OK] Census API: County {state_fips}-{county_fips} - {len(incomes)} tract incomes loaded")
+            return incomes
+        print(f"Census income API: HTTP {r.status_code}")
+    except (CircuitOpenError, deadline.DeadlineExceeded) as e:
+        print(f"Census income API: {e}, skipping county {state_fips}-{county_fips}")
     except Exception as e:
         print(f"Census income API error: {e}")
-    
-    print(f"Census API: Using default income for tract {tract_fips}")
-    return 50000  # Default fallback
+    return None
 
 # ---------------------------------------
 # Real-Time Store Data Generator
@@ -281,77 +615,29 @@ WAGE_STANDARDS = {
 
 def get_store_type_from_id(store_id):
     """Extract store type from store_id (format: type_osmid or just osmid)"""
-    store_id_str = str(store_id)
-    for store_type in WAGE_STANDARDS.keys():
-        if store_type in store_id_str.lower():
-            return store_type
-    return "default"
-
-def generate_consistent_random(store_id, seed_suffix=""):
-    """Generate consistent pseudo-random value based on store_id"""
-    hash_input = f"{store_id}{seed_suffix}".encode()
-    hash_value = int(hashlib.md5(hash_input).hexdigest(), 16)
-    return hash_value / (16 ** 32)  # Normalize to 0-1
-
-# ---------------------------------------
-# Living Wage Estimator
-# ---------------------------------------
-def living_wage(median_income):
-    return (median_income / 2080) * 0.35
-
-# ---------------------------------------
-# EJV SCORING FUNCTIONS (0–25 each)
-# ---------------------------------------
-def wage_score(avg_wage, living_wage):
-    return min(25, (avg_wage / living_wage) * 25)
-
-def hiring_score(local_hire_pct, svi=0.7):
-    return min(25, local_hire_pct * 25 * (1 + svi))
-
-def community_score(community_spend, payroll):
-    return min(25, (community_spend / payroll) * 25)
-
-def participation_score(active_employees, benchmark=25):
-    return min(25, (active_employees / benchmark) * 25)
+    return scoring.store_type_from_id(store_id, WAGE_STANDARDS.keys())
 
 # ---------------------------------------
 # ZIP NEED MODIFIER - based on local conditions
 # ---------------------------------------
-def get_zip_need_modifier(zip_code, dimension):
+def get_zip_need_modifier(zip_code, dimension, economic_data=None):
     """
     Calculate ZIP-level need modifier for specific dimensions
     NM ranges from 0.80 (low need) to 1.10 (high need)
     Dimensions: AES, ART, HWI
+    Pass economic_data (or a resolved economic context) to skip the Census lookup.
     """
-    economic_data = get_local_economic_indicators(zip_code)
-    unemployment = economic_data.get('unemployment_rate', 5.0)
-    median_income = economic_data.get('median_income', 50000)
-    
-    # Calculate need based on unemployment and income
-    # Higher unemployment + lower income = higher need (higher modifier)
-    unemployment_factor = min(unemployment / 10.0, 1.0)  # Normalize to 0-1
-    income_factor = max(0, 1 - (median_income / 75000))  # Lower income = higher need
-    
-    # Combine factors: 0.80 (low need) to 1.10 (high need)
-    base_modifier = 0.80 + (0.30 * ((unemployment_factor + income_factor) / 2))
-    
-    # Dimension-specific adjustments
-    if dimension == "AES":  # Access to Essential Services
-        modifier = base_modifier * 1.05  # Slightly higher weight for essential services
-    elif dimension == "HWI":  # Health, Wellness & Inclusion
-        modifier = base_modifier * 1.03  # Higher weight for health in high-need areas
-    elif dimension == "ART":  # Access to Resources & Technology
-        modifier = base_modifier * 1.02  # Technology access in underserved areas
-    else:
-        modifier = base_modifier
-    
-    # Clamp to valid range [0.80, 1.10]
-    return round(min(1.10, max(0.80, modifier)), 2)
+    justice = economic_data.get("justice") if economic_data is not None else None
+    if justice is not None and dimension in justice["modifiers"]:
+        return justice["modifiers"][dimension]
+    if economic_data is None:
+        economic_data = get_local_economic_indicators(zip_code)
+    return scoring.zip_need_modifier(economic_data, dimension)
 
 # ---------------------------------------
 # EJV v2 CALCULATION - Justice-Weighted Local Impact
 # ---------------------------------------
-def calculate_ejv_v2(store_id, purchase_amount=100.0, state_fips="01", county_fips="089", tract_fips="010100", zip_code="10001", location_name="Unknown"):
+def calculate_ejv_v2(store_id, purchase_amount=100.0, state_fips="01", county_fips="089", tract_fips="010100", zip_code="10001", location_name="Unknown", context=None, payroll=None):
     """
     EJV v2: Economic Justice Value Calculation
     
@@ -367,157 +653,52 @@ def calculate_ejv_v2(store_id, purchase_amount=100.0, state_fips="01", county_fi
     1. Adjust dimension scores with ZIP Need Modifier
     2. Calculate Justice Score (average of adjusted dimensions × 100)
     3. Compute EJV v2 = (P × LC) × (JS_ZIP / 100)
-    """
-    median_income = get_median_income(state_fips, county_fips, tract_fips)
-    lw = living_wage(median_income)
-
-    # Get local economic conditions for this specific area
-    economic_data = get_local_economic_indicators(zip_code)
-    
-    payroll = get_payroll_data(store_id, zip_code=zip_code, economic_data=economic_data)
-
-    # Calculate base dimension scores (normalized to 0-1)
-    w_score = wage_score(payroll["avg_wage"], lw) / 25  # 0-1
-    h_score = hiring_score(payroll["local_hire_pct"]) / 25  # 0-1
-    c_score = community_score(payroll["community_spend_today"], payroll["daily_payroll"]) / 25  # 0-1
-    p_score = participation_score(payroll["active_employees"]) / 25  # 0-1
-    
-    # Map dimensions to our scores
-    # AES (Access to Essential Services) = Community Score
-    # ART (Access to Resources & Technology) = Wage Score (better wages = tech access)
-    # HWI (Health, Wellness & Inclusion) = Hiring Score (local hiring = inclusion)
-    # Other dimensions use base scores
-    
-    dimensions = {
-        "AES": c_score,  # Access to Essential Services
-        "ART": w_score,  # Access to Resources & Technology
-        "HWI": h_score,  # Health, Wellness & Inclusion
-        "PSR": c_score,  # Public Service Representation
-        "CAI": p_score,  # Cultural Awareness & Inclusivity
-        "JCE": h_score,  # Job Creation/Economic Empowerment
-        "FSI": w_score,  # Financial Support & Investment
-        "CED": (c_score + p_score) / 2,  # Community Engagement & Development
-        "ESD": h_score,  # Education & Skill Development
-    }
-    
-    # Get ZIP Need Modifiers for applicable dimensions
-    nm_aes = get_zip_need_modifier(zip_code, "AES")
-    nm_art = get_zip_need_modifier(zip_code, "ART")
-    nm_hwi = get_zip_need_modifier(zip_code, "HWI")
-    
-    # Step 1: Adjust dimension scores with NM (only for AES, ART, HWI)
-    adjusted_dimensions = {}
-    for dim, score in dimensions.items():
-        if dim == "AES":
-            adjusted_dimensions[dim] = min(1.0, max(0.0, score * nm_aes))
-        elif dim == "ART":
-            adjusted_dimensions[dim] = min(1.0, max(0.0, score * nm_art))
-        elif dim == "HWI":
-            adjusted_dimensions[dim] = min(1.0, max(0.0, score * nm_hwi))
-        else:
-            adjusted_dimensions[dim] = score
-    
-    # Step 2: Calculate Justice Score (average of all adjusted dimensions × 100)
-    js_zip = sum(adjusted_dimensions.values()) / len(adjusted_dimensions) * 100
-    
-    # Local Capture = local hire percentage
-    lc = payroll["local_hire_pct"]
     
-    # Step 3: Compute EJV v2 = (P × LC) × (JS_ZIP / 100)
-    ejv_v2 = (purchase_amount * lc) * (js_zip / 100)
-    
-    # Also calculate traditional EJV for comparison
-    ejv_v1 = (w_score + h_score + c_score + p_score) * 25
-    
-    # Calculate wealth metrics
-    daily_wages_paid = payroll["daily_payroll"]
-    wealth_retained = daily_wages_paid * lc + payroll["community_spend_today"]
-    wealth_leakage = daily_wages_paid * (1 - lc)
-
+    Pass a context from resolve_economic_context (and the store's payroll from
+    get_payroll_data) to reuse already-resolved inputs.
+    """
+    if context is None:
+        context = resolve_economic_context(zip_code, state_fips, county_fips, tract_fips)
+    if payroll is None:
+        payroll = get_payroll_data(store_id, zip_code=zip_code, economic_data=context)
     return {
         "store_id": store_id,
         "location": location_name,
         "zip_code": zip_code,
-        "ejv_version": "2.0",
-        "EJV": round(ejv_v1, 2),  # Traditional EJV (0-100 scale)
-        "ejv_v2": round(ejv_v2, 2),  # Justice-Weighted Local Impact ($)
-        "purchase_amount": purchase_amount,
-        "local_capture": round(lc, 3),
-        "justice_score_zip": round(js_zip, 2),
-        "zip_modifiers": {
-            "AES": nm_aes,
-            "ART": nm_art,
-            "HWI": nm_hwi
-        },
-        "dimensions": {
-            "AES": round(dimensions["AES"], 3),
-            "ART": round(dimensions["ART"], 3),
-            "HWI": round(dimensions["HWI"], 3),
-            "PSR": round(dimensions["PSR"], 3),
-            "CAI": round(dimensions["CAI"], 3),
-            "JCE": round(dimensions["JCE"], 3),
-            "FSI": round(dimensions["FSI"], 3),
-            "CED": round(dimensions["CED"], 3),
-            "ESD": round(dimensions["ESD"], 3),
-        },
-        "adjusted_dimensions": {k: round(v, 3) for k, v in adjusted_dimensions.items()},
-        "wage_score": round(w_score * 25, 2),
-        "hiring_score": round(h_score * 25, 2),
-        "community_score": round(c_score * 25, 2),
-        "participation_score": round(p_score * 25, 2),
-        "wealth_retained": round(wealth_retained, 2),
-        "wealth_leakage": round(wealth_leakage, 2),
-        "median_income": median_income,
-        "living_wage": round(lw, 2),
-        "unemployment_rate": round(economic_data.get('unemployment_rate', 5.0), 1),
-        "local_hire_pct": lc,
-        "calculation_formula": f"EJV v2 = ({purchase_amount} × {round(lc, 2)}) × ({round(js_zip, 2)}/100) = ${round(ejv_v2, 2)}"
+        **scoring.score_ejv_v2(payroll, context, purchase_amount, justice=context.get("justice"))
     }
 
 # ---------------------------------------
 # FINAL EJV CALCULATION (v1 - Original)
 # ---------------------------------------
-def calculate_ejv(store_id, state_fips="01", county_fips="089", tract_fips="010100", zip_code="10001", location_name="Unknown"):
-    median_income = get_median_income(state_fips, county_fips, tract_fips)
-    lw = living_wage(median_income)
-
-    # Get local economic conditions for this specific area
-    economic_data = get_local_economic_indicators(zip_code)
-    
-    payroll = get_payroll_data(store_id, zip_code=zip_code, economic_data=economic_data)
-
-    w_score = wage_score(payroll["avg_wage"], lw)
-    h_score = hiring_score(payroll["local_hire_pct"])
-    c_score = community_score(
-        payroll["community_spend_today"],
-        payroll["daily_payroll"]
-    )
-    p_score = participation_score(payroll["active_employees"])
-
-    ejv = w_score + h_score + c_score + p_score
-    
-    # Calculate wealth metrics
-    daily_wages_paid = payroll["daily_payroll"]
-    wealth_retained = daily_wages_paid * payroll["local_hire_pct"] + payroll["community_spend_today"]
-    wealth_leakage = daily_wages_paid * (1 - payroll["local_hire_pct"])
-
+def calculate_ejv(store_id, state_fips="01", county_fips="089", tract_fips="010100", zip_code="10001", location_name="Unknown", context=None, payroll=None):
+    if context is None:
+        context = resolve_economic_context(zip_code, state_fips, county_fips, tract_fips)
+    if payroll is None:
+        payroll = get_payroll_data(store_id, zip_code=zip_code, economic_data=context)
     return {
         "store_id": store_id,
         "location": location_name,
         "zip_code": zip_code,
-        "EJV": round(ejv, 2),
-        "wage_score": round(w_score, 2),
-        "hiring_score": round(h_score, 2),
-        "community_score": round(c_score, 2),
-        "participation_score": round(p_score, 2),
-        "wealth_retained": round(wealth_retained, 2),
-        "wealth_leakage": round(wealth_leakage, 2),
-        "median_income": median_income,
-        "living_wage": round(lw, 2),
-        "unemployment_rate": round(economic_data.get('unemployment_rate', 5.0), 1),
-        "local_hire_pct": payroll["local_hire_pct"]
+        **scoring.score_ejv_v1(payroll, context)
     }
 
+# ---------------------------------------
+# Fused EJV v1 + v2 calculation
+# ---------------------------------------
+def calculate_ejv_both(store_id, purchase_amount=100.0, state_fips="01", county_fips="089", tract_fips="010100", zip_code="10001", location_name="Unknown", context=None):
+    """
+    Calculate EJV v1 and v2 for one store from a single set of inputs:
+    Census data and payroll are resolved once and shared by both calculators.
+    Returns (ejv_v1, ejv_v2), the same payloads as calculate_ejv / calculate_ejv_v2.
+    """
+    if context is None:
+        context = resolve_economic_context(zip_code, state_fips, county_fips, tract_fips)
+    payroll = get_payroll_data(store_id, zip_code=zip_code, economic_data=context)
+    ejv_v1 = calculate_ejv(store_id, zip_code=zip_code, location_name=location_name, context=context, payroll=payroll)
+    ejv_v2 = calculate_ejv_v2(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location_name, context=context, payroll=payroll)
+    return ejv_v1, ejv_v2
+
 # ---------------------------------------
 # Calculate aggregate EJV for multiple stores
 # ---------------------------------------
@@ -531,24 +712,53 @@ def calculate_aggregate_ejv(stores):
             "total_wealth_leakage": 0
         }
     
-    total_ejv = 0
-    total_retained = 0
-    total_leakage = 0
-    
-    for store in stores:
-        store_id = store.get('osm_id', store.get('id', 'unknown'))
-        result = calculate_ejv(store_id)
-        total_ejv += result['EJV']
-        total_retained += result['wealth_retained']
-        total_leakage += result['wealth_leakage']
-    
+    # Every store is scored against the same default area, so resolve it once
+    context = resolve_economic_context()
+    store_ids = [aggregate_store_id(store) for store in stores]
+    scores = score_stores_v1(store_ids, context)
+    
+    # Python's sequential sum keeps totals identical to the scalar loop
+    return aggregate_summary(
+        len(stores),
+        sum(scores["EJV"]),
+        sum(scores["wealth_retained"]),
+        sum(scores["wealth_leakage"])
+    )
+
+def aggregate_store_id(store):
+    return store.get('osm_id', store.get('id', 'unknown'))
+
+def aggregate_summary(total_stores, total_ejv, total_retained, total_leakage):
     return {
-        "total_stores": len(stores),
-        "average_ejv": round(total_ejv / len(stores), 2),
+        "total_stores": total_stores,
+        "average_ejv": round(total_ejv / total_stores, 2) if total_stores else 0,
         "total_wealth_retained": round(total_retained, 2),
         "total_wealth_leakage": round(total_leakage, 2)
     }
 
+AGGREGATE_SCORE_FIELDS = aggregate_pool.V1_FIELDS
+
+def score_stores_v1(store_ids, context):
+    """
+    Score stores against one economic context with EJV v1
+    Returns {field: list of per-store values} for AGGREGATE_SCORE_FIELDS
+    Large lists are split across the aggregate scoring process pool.
+    """
+    if aggregate_pool.enabled_for(len(store_ids)):
+        type_inputs = {store_type: get_store_type_inputs(store_type) for store_type in WAGE_STANDARDS}
+        scores = aggregate_pool.score_v1_columns(list(store_ids), context, type_inputs, datetime.now().year)
+        if scores is not None:
+            return scores
+    
+    if ejv_batch is not None:
+        # Score the whole batch as array operations
+        payrolls = [get_payroll_data(store_id, zip_code=context["zip_code"], economic_data=context) for store_id in store_ids]
+        scores = ejv_batch.score_payrolls(store_ids, payrolls, [context] * len(store_ids))["v1"]
+        return {field: scores[field].tolist() for field in AGGREGATE_SCORE_FIELDS}
+    
+    results = [calculate_ejv(store_id, context=context) for store_id in store_ids]
+    return {field: [result[field] for result in results] for field in AGGREGATE_SCORE_FIELDS}
+
 
 # ---------------------------------------
 # AUTHENTICATION ENDPOINTS
@@ -715,107 +925,41 @@ def logout():
 
 @app.route('/api/overpass', methods=['POST'])
 def overpass_proxy():
-    """Proxy for Overpass API requests with retry logic, optimization, and multiple fallbacks"""
+    """Proxy for Overpass API requests with query optimization, result caching and hedged mirror fallbacks"""
     try:
         query = request.data.decode('utf-8')
         
-        # Optimize query - reduce timeout and add result limit if not present
-        if '[out:json]' in query and '[timeout:' not in query:
-            query = query.replace('[out:json]', '[out:json][timeout:25]')
-        elif '[timeout:30]' in query:
-            query = query.replace('[timeout:30]', '[timeout:25]')
-        
-        # Add result limit if not present (prevent huge responses)
-        if 'out center' in query and not 'out center' in query.split(');')[1]:
-            query = query.replace('out center;', 'out center 100;')
-        
+        query = overpass.optimize_query(query)
         print(f"Optimized query: {query[:150]}...")
         
-        # Multiple backup servers with different endpoints (8 servers for better reliability)
-        servers = [
-            'https://overpass.kumi.systems/api/interpreter',  # Often fastest
-            'https://overpass-api.de/api/interpreter',        # Main instance
-            'https://overpass.openstreetmap.ru/api/interpreter',
-            'https://overpass.openstreetmap.fr/api/interpreter',
-            'https://overpass.nchc.org.tw/api/interpreter',   # Taiwan mirror
-            'https://maps.mail.ru/osm/tools/overpass/api/interpreter',  # Russia
-            'https://overpass.openstreetmap.ie/api/interpreter',  # Ireland
-            'https://overpass-turbo.eu/api/interpreter'       # EU mirror
-        ]
-        
-        last_error = None
-        retry_delays = [0, 1, 2]  # Faster progressive backoff
-        
-        # Try each server with retries
-        for i, server in enumerate(servers):
-            for retry in range(2):  # 2 attempts per server
-                try:
-                    attempt = f"{i+1}/{len(servers)}" + (f" (retry {retry+1})" if retry > 0 else "")
-                    print(f"Trying Overpass server {attempt}: {server}")
-                    
-                    response = requests.post(
-                        server,
-                        data=query,
-                        timeout=30,  # Slightly longer timeout for 503 resilience
-                        headers={
-                            'User-Agent': 'FIX-GeoEquity/1.0',
-                            'Accept': 'application/json'
-                        }
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        result_count = len(data.get('elements', []))
-                        print(f"[OK] Server {i+1} success: {result_count} results")
-                        return jsonify(data), 200
-                    elif response.status_code == 429:
-                        error_msg = "Rate limited"
-                        print(f"[FAIL] Server {i+1} rate limited")
-                        last_error = error_msg
-                        time.sleep(3)  # Wait longer for rate limit
-                    elif response.status_code == 503:
-                        error_msg = "Service unavailable (503)"
-                        print(f"[FAIL] Server {i+1} temporarily unavailable (503)")
-                        last_error = error_msg
-                        # Continue to next server immediately for 503
-                        break
-                    elif response.status_code == 504:
-                        error_msg = "Gateway timeout - query too complex"
-                        print(f"[FAIL] Server {i+1} timeout: {error_msg}")
-                        last_error = error_msg
-                        break  # Don't retry timeouts on same server
-                    else:
-                        error_msg = f"HTTP {response.status_code}"
-                        print(f"[FAIL] Server {i+1} failed: {error_msg}")
-                        last_error = error_msg
-                        
-                except requests.Timeout:
-                    print(f"[FAIL] Server {i+1} connection timeout")
-                    last_error = "Connection timeout"
-                    break  # Don't retry timeouts
-                except requests.RequestException as e:
-                    error_str = str(e)[:100]
-                    print(f"[FAIL] Server {i+1} error: {error_str}")
-                    last_error = error_str
-                    if retry == 0:
-                        time.sleep(1)  # Brief wait before retry
-                
-                # Small delay between retries (not for 503, move to next server fast)
-                if retry < 1 and last_error != "Service unavailable (503)":
-                    time.sleep(0.5)
+        # Radius searches are answered from cached map tiles, other repeat searches
+        # from the result cache; misses go to the best mirror first, with backups
+        # hedged in after a short delay (first 200 wins)
+        try:
+            data = overpass_tiles.tiled_query(query)
+            if data is not None:
+                return jsonify(data), 200
+            # Pass the body through in chunks (gzip if the client takes it) instead of parsing it
+            body, headers = overpass.stream_query(query, accept_gzip='gzip' in request.accept_encodings)
+            headers['Vary'] = 'Accept-Encoding'
+            return Response(body, status=200, headers=headers)
+        except overpass.OverpassUnavailable as failure:
+            if failure.deadline_exceeded:
+                print(f"❌ Overpass proxy: request deadline exceeded after trying {failure.servers_tried} server(s)")
+                deadline.mark_degraded("Overpass request deadline exceeded; no results")
+                return jsonify({
+                    "error": "Store search took too long. Try: (1) Reduce radius to 1-2 miles, (2) Wait 30-60 seconds, (3) Different location/category",
+                    "details": f"Request deadline exceeded after trying {failure.servers_tried} of {failure.servers_total} servers",
+                    "elements": []
+                }), 504
             
-            # Shorter delay before trying next server (faster failover for 503)
-            if i < len(servers) - 1:
-                delay = 0.3 if last_error == "Service unavailable (503)" else (retry_delays[i] if i < len(retry_delays) else 1)
-                time.sleep(delay)
-        
-        # All servers failed - provide helpful message
-        print(f"❌ All {len(servers)} Overpass servers failed. Last error: {last_error}")
-        return jsonify({
-            "error": "All Overpass servers temporarily unavailable. Try: (1) Reduce radius to 1-2 miles, (2) Wait 30-60 seconds, (3) Different location/category",
-            "details": f"Tried {len(servers)} servers. Last error: {last_error}",
-            "elements": []
-        }), 503
+            # All servers failed - provide helpful message
+            print(f"❌ All {failure.servers_total} Overpass servers failed. Last error: {failure.last_error}")
+            return jsonify({
+                "error": "All Overpass servers temporarily unavailable. Try: (1) Reduce radius to 1-2 miles, (2) Wait 30-60 seconds, (3) Different location/category",
+                "details": f"Tried {failure.servers_total} servers. Last error: {failure.last_error}",
+                "elements": []
+            }), 503
         
     except Exception as e:
         error_msg = str(e)
@@ -826,6 +970,13 @@ def overpass_proxy():
             "elements": []
         }), 500
 
+@app.route('/api/overpass/mirrors', methods=['GET'])
+def overpass_mirrors():
+    """Overpass mirror ranking with the latency and error stats behind it (diagnostics)"""
+    stats = overpass.stats()
+    stats["tiles"] = overpass_tiles.stats()
+    return jsonify(stats)
+
 @app.route('/api/user', methods=['GET'])
 def get_user():
     """Get current user information"""
@@ -919,19 +1070,9 @@ def about_fix():
 # ---------------------------------------
 
 
-@app.route('/api/ejv/<store_id>', methods=['GET'])
-def get_ejv(store_id):
-    """Get both EJV v1 and v2 for a single store"""
-    zip_code = request.args.get('zip', '10001')
-    location = request.args.get('location', 'Unknown')
-    purchase_amount = float(request.args.get('purchase', '100.0'))
-    
-    # Calculate both versions
-    ejv_v1 = calculate_ejv(store_id, zip_code=zip_code, location_name=location)
-    ejv_v2 = calculate_ejv_v2(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location)
-    
-    # Combine results
-    return jsonify({
+def build_ejv_response(store_id, location, zip_code, purchase_amount, ejv_v1, ejv_v2):
+    """Combine calculate_ejv and calculate_ejv_v2 results into the /api/ejv response shape"""
+    return {
         "store_id": store_id,
         "location": location,
         "zip_code": zip_code,
@@ -961,26 +1102,174 @@ def get_ejv(store_id):
             "retained": ejv_v1.get("wealth_retained", 0),
             "leakage": ejv_v1.get("wealth_leakage", 0)
         }
+    }
+
+@app.route('/api/ejv/<store_id>', methods=['GET'])
+def get_ejv(store_id):
+    """Get both EJV v1 and v2 for a single store"""
+    zip_code = request_zip()
+    location = request.args.get('location', 'Unknown')
+    purchase_amount = float(request.args.get('purchase', '100.0'))
+    
+    # Calculate both versions from one set of inputs
+    ejv_v1, ejv_v2 = calculate_ejv_both(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location)
+    
+    # Combine results
+    return jsonify(build_ejv_response(store_id, location, zip_code, purchase_amount, ejv_v1, ejv_v2))
+
+EJV_BATCH_MAX_ITEMS = 500
+
+@app.route('/api/ejv/batch', methods=['POST'])
+def get_ejv_batch():
+    """
+    Get EJV v1 and v2 for many stores in one round trip
+    Body: [{store_id, zip, tract, purchase, location}, ...] or {"stores": [...]}
+    - tract: optional 11-digit census tract GEOID (state + county + tract FIPS)
+    Census data is resolved once per distinct ZIP/tract for the whole batch.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('stores') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({
+            "success": False,
+            "message": "Expected a list of {store_id, zip, tract, purchase} objects"
+        }), 400
+    if len(items) > EJV_BATCH_MAX_ITEMS:
+        return jsonify({
+            "success": False,
+            "message": f"At most {EJV_BATCH_MAX_ITEMS} stores per batch"
+        }), 400
+    
+    locations = []
+    purchases = []
+    for item in items:
+        if item.get('store_id') in (None, ''):
+            return jsonify({"success": False, "message": "Every item needs a store_id"}), 400
+        purchase = item.get('purchase')
+        try:
+            purchase_amount = 100.0 if purchase is None else float(purchase)
+        except (TypeError, ValueError):
+            purchase_amount = None
+        if purchase_amount is None or not math.isfinite(purchase_amount) or purchase_amount < 0:
+            return jsonify({"success": False, "message": f"Invalid purchase amount for store {item['store_id']}"}), 400
+        purchases.append(purchase_amount)
+        zip_code = DEFAULT_ZIP if item.get('zip') in (None, '') else clean_zip(item['zip'])
+        if zip_code is None:
+            return jsonify({"success": False, "message": f"Invalid ZIP for store {item['store_id']}"}), 400
+        location = {"zip_code": zip_code}
+        tract = str(item.get('tract') or '')
+        if len(tract) == 11 and tract.isdigit():
+            location.update(state_fips=tract[:2], county_fips=tract[2:5], tract_fips=tract[5:])
+        locations.append(location)
+    
+    contexts = resolve_economic_contexts(locations)
+    
+    results = []
+    for item, purchase_amount, context in zip(items, purchases, contexts):
+        store_id = str(item['store_id'])
+        location = item.get('location', 'Unknown')
+        zip_code = context["zip_code"]
+        ejv_v1, ejv_v2 = calculate_ejv_both(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location, context=context)
+        results.append(build_ejv_response(store_id, location, zip_code, purchase_amount, ejv_v1, ejv_v2))
+    
+    return jsonify({
+        "success": True,
+        "count": len(results),
+        "results": results
     })
 
 @app.route('/api/ejv-v2/<store_id>', methods=['GET'])
 def get_ejv_v2(store_id):
     """Get EJV v2 (Justice-Weighted Local Impact) for a single store"""
-    zip_code = request.args.get('zip', '10001')
+    zip_code = request_zip()
     location = request.args.get('location', 'Unknown')
     purchase_amount = float(request.args.get('purchase', '100.0'))
     result = calculate_ejv_v2(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location)
     return jsonify(result)
 
+EJV_SWEEP_MAX_POINTS = 1000
+
+def parse_purchase_amounts(args):
+    """
+    Purchase amounts for a sweep: amounts=10,25,50 or start/stop/step (inclusive stop)
+    Raises ValueError with a client-facing message on bad input.
+    """
+    if args.get('amounts'):
+        try:
+            amounts = [float(value) for value in args['amounts'].split(',') if value.strip()]
+        except ValueError:
+            raise ValueError("amounts must be a comma-separated list of numbers")
+        if not all(math.isfinite(amount) for amount in amounts):
+            raise ValueError("Purchase amounts must be finite numbers")
+    else:
+        try:
+            start = float(args.get('start', '10'))
+            stop = float(args.get('stop', '500'))
+            step = float(args.get('step', '10'))
+        except ValueError:
+            raise ValueError("start, stop and step must be numbers")
+        if not all(math.isfinite(value) for value in (start, stop, step)):
+            raise ValueError("start, stop and step must be finite numbers")
+        if step <= 0 or stop < start:
+            raise ValueError("step must be positive and stop must not be below start")
+        # Compare before int(): a tiny step overflows the point count to inf
+        intervals = (stop - start) / step + 1e-9
+        if intervals >= EJV_SWEEP_MAX_POINTS:
+            raise ValueError(f"At most {EJV_SWEEP_MAX_POINTS} purchase amounts per sweep")
+        count = int(intervals) + 1
+        amounts = [round(start + i * step, 2) for i in range(count)]
+    if not amounts:
+        raise ValueError("No purchase amounts given")
+    if len(amounts) > EJV_SWEEP_MAX_POINTS:
+        raise ValueError(f"At most {EJV_SWEEP_MAX_POINTS} purchase amounts per sweep")
+    if any(amount < 0 for amount in amounts):
+        raise ValueError("Purchase amounts must not be negative")
+    return amounts
+
+@app.route('/api/ejv-v2/<store_id>/sweep', methods=['GET'])
+def get_ejv_v2_sweep(store_id):
+    """
+    EJV v2 over a range of purchase amounts for one store
+    Query: zip, location, and amounts=10,25,50 or start/stop/step
+    EJV v2 is linear in the purchase amount, so LC and JS_ZIP are resolved once
+    and the whole curve comes back in one response.
+    """
+    zip_code = request_zip()
+    location = request.args.get('location', 'Unknown')
+    try:
+        amounts = parse_purchase_amounts(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    context = resolve_economic_context(zip_code)
+    payroll = get_payroll_data(store_id, zip_code=zip_code, economic_data=context)
+    lc = payroll["local_hire_pct"]
+    js_zip = scoring.justice_score(payroll, context, context["justice"])["js_zip"]
+    values = scoring.ejv_v2_curve(lc, js_zip, amounts)
+    
+    return jsonify({
+        "store_id": store_id,
+        "location": location,
+        "zip_code": zip_code,
+        "local_capture": round(lc, 3),
+        "justice_score_zip": round(js_zip, 2),
+        "impact_per_dollar": round(lc * js_zip / 100, 4),
+        "formula": f"EJV v2 = (P × {round(lc, 2)}) × ({round(js_zip, 2)}/100)",
+        "points": [
+            {"purchase_amount": amount, "ejv_v2": value}
+            for amount, value in zip(amounts, values)
+        ]
+    })
+
 @app.route('/api/ejv-comparison/<store_id>', methods=['GET'])
 def get_ejv_comparison(store_id):
     """Compare EJV v1 and EJV v2 for a store"""
-    zip_code = request.args.get('zip', '10001')
+    zip_code = request_zip()
     location = request.args.get('location', 'Unknown')
     purchase_amount = float(request.args.get('purchase', '100.0'))
     
-    ejv_v1 = calculate_ejv(store_id, zip_code=zip_code, location_name=location)
-    ejv_v2 = calculate_ejv_v2(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location)
+    # Resolve Census data and payroll once and share them between both calculators
+    ejv_v1, ejv_v2 = calculate_ejv_both(store_id, purchase_amount=purchase_amount, zip_code=zip_code, location_name=location)
     
     return jsonify({
         "store_id": store_id,
@@ -1023,14 +1312,18 @@ def area_comparison():
         {"zip": "98101", "name": "Seattle, WA (Tech Hub)", "state": "53", "county": "033"},
     ]
     
+    # Resolve Census data for every area in one batch
+    contexts = resolve_economic_contexts([{"zip_code": area['zip']} for area in areas])
+    
     results = []
-    for area in areas:
+    for area, context in zip(areas, contexts):
         # Calculate EJV for a standard supermarket in each area
         store_id = f"supermarket_{area['zip']}"
         ejv_data = calculate_ejv(
             store_id,
             zip_code=area['zip'],
-            location_name=area['name']
+            location_name=area['name'],
+            context=context
         )
         results.append(ejv_data)
     
@@ -1057,10 +1350,76 @@ def get_aggregate_ejv():
     result = calculate_aggregate_ejv(stores)
     return jsonify(result)
 
+# Stores scored per chunk (and per response write) by the streaming endpoint
+EJV_STREAM_CHUNK_SIZE = int(os.environ.get('EJV_STREAM_CHUNK_SIZE', 500))
+
+@app.route('/api/ejv/aggregate/stream', methods=['POST'])
+def get_aggregate_ejv_stream():
+    """
+    Streaming variant of /api/ejv/aggregate for very large store lists
+    Body: newline-delimited JSON, one store object per line ({"osm_id": ...} or {"id": ...})
+    Response: NDJSON; one {"store_id", "EJV", ...} line per store, written as each chunk
+    of EJV_STREAM_CHUNK_SIZE stores is scored, then a final {"summary": {...}} line
+    matching calculate_aggregate_ejv. Malformed lines produce an {"line", "error"}
+    line and are left out of the summary.
+    """
+    # Resolve the shared context before streaming so the request deadline covers it
+    context = resolve_economic_context()
+    
+    totals = {"stores": 0, "EJV": 0, "wealth_retained": 0, "wealth_leakage": 0}
+    
+    def score_chunk(store_ids):
+        scores = score_stores_v1(store_ids, context)
+        totals["stores"] += len(store_ids)
+        for field in ("EJV", "wealth_retained", "wealth_leakage"):
+            # Sequential sum in input order, same as calculate_aggregate_ejv
+            totals[field] = sum(scores[field], totals[field])
+        lines = []
+        for i, store_id in enumerate(store_ids):
+            row = {"store_id": store_id}
+            for field in AGGREGATE_SCORE_FIELDS:
+                row[field] = scores[field][i]
+            lines.append(json.dumps(row))
+        return "\n".join(lines) + "\n"
+    
+    def generate():
+        chunk = []
+        line_number = 0
+        for raw_line in request.stream:
+            line_number += 1
+            if not raw_line.strip():
+                continue
+            try:
+                store = json.loads(raw_line)
+                if not isinstance(store, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                yield json.dumps({"line": line_number, "error": str(e)}) + "\n"
+                continue
+            chunk.append(aggregate_store_id(store))
+            if len(chunk) >= EJV_STREAM_CHUNK_SIZE:
+                yield score_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield score_chunk(chunk)
+        summary = aggregate_summary(totals["stores"], totals["EJV"], totals["wealth_retained"], totals["wealth_leakage"])
+        yield json.dumps({"summary": summary}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "FIX$ EJV API is running"})
+    return jsonify({
+        "status": "healthy",
+        "message": "FIX$ EJV API is running",
+        "upstreams": {
+            "census": {
+                "circuit_breaker": census_breaker.status()
+            }
+        },
+        "aggregate_pool": aggregate_pool.stats()
+    })
 
 @app.route('/api/ejv-v1/help', methods=['GET'])
 def get_ejv_v1_help():
@@ -1343,13 +1702,17 @@ def get_demo_stores():
         {"id": 5001, "name": "QFC", "shop": "supermarket", "lat": 47.6062, "lon": -122.3321, "zip": "98101", "location": "Seattle, WA"}
     ]
     
+    # Resolve Census data for every distinct ZIP in one batch
+    contexts = resolve_economic_contexts([{"zip_code": store['zip']} for store in demo_stores])
+    
     # Calculate EJV for each store with location data
     stores_with_ejv = []
-    for store in demo_stores:
+    for store, context in zip(demo_stores, contexts):
         ejv_data = calculate_ejv(
             f"{store['shop']}_{store['id']}",
             zip_code=store['zip'],
-            location_name=store['location']
+            location_name=store['location'],
+            context=context
         )
         store_data = {
             **store,
@@ -1388,8 +1751,11 @@ if __name__ == '__main__':
     print("\n🌐 Server running on: http://localhost:5000")
     print("\n📡 Available API Endpoints:")
     print("  - GET  /api/health                  (Health check)")
+    print("  - GET  /api/overpass/mirrors        (Overpass mirror ranking)")
     print("  - GET  /api/ejv/<store_id>          (Get EJV for single store)")
+    print("  - GET  /api/ejv-v2/<id>/sweep       (EJV v2 across purchase amounts)")
     print("  - POST /api/ejv/aggregate           (Get aggregate EJV)")
+    print("  - POST /api/ejv/aggregate/stream    (Stream aggregate EJV as NDJSON)")
     print("  - GET  /api/about/fix               (About FIX$)")
     print("  - GET  /api/stores/demo             (Demo stores with EJV)")
     print("  - GET  /api/area-comparison         (Geographic area comparison)")
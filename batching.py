@@ -0,0 +1,91 @@
+"""
+Cross-request micro-batching for upstream APIs that accept multi-key requests.
+
+MicroBatcher holds lookups arriving from different threads for a short window
+and then resolves them with a single batch call, handing each waiting caller
+its own result. At peak load this turns many small upstream calls into a few
+larger ones.
+"""
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class MicroBatcher:
+    """Collect concurrent single-key lookups into one batch call per window"""
+
+    def __init__(self, name, batch_fn, window=0.015, max_batch=50):
+        """
+        name:      label used in log lines and stats
+        batch_fn:  callable(list_of_keys) -> {key: result}; missing keys resolve to None
+        window:    seconds to hold the first lookup of a batch (0 disables batching)
+        max_batch: flush immediately once this many distinct keys are waiting
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> Future
+        self._flush_scheduled = False
+        self.batches = 0
+        self.lookups = 0
+
+    def submit(self, key, timeout=None):
+        """
+        Queue key for the next batch and block until its result is available.
+        Raises TimeoutError if the result is not ready within timeout seconds.
+        """
+        if self.window <= 0:
+            self.batches += 1
+            self.lookups += 1
+            return self.batch_fn([key]).get(key)
+
+        with self._lock:
+            self.lookups += 1
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+            flush_now = len(self._pending) >= self.max_batch
+            schedule = not flush_now and not self._flush_scheduled
+            if schedule:
+                self._flush_scheduled = True
+
+        if flush_now:
+            self._flush()
+        elif schedule:
+            timer = threading.Timer(self.window, self._flush)
+            timer.daemon = True
+            timer.start()
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"{self.name} batch result for {key!r} not ready in time")
+
+    def _flush(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = {}
+            self._flush_scheduled = False
+        if not batch:
+            return
+
+        self.batches += 1
+        try:
+            results = self.batch_fn(list(batch))
+        except Exception as e:
+            print(f"{self.name} batch error: {e}")
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for key, future in batch.items():
+            future.set_result(results.get(key))
+
+    def stats(self):
+        return {
+            "window_ms": round(self.window * 1000, 1),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "lookups": self.lookups
+        }
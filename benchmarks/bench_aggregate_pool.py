@@ -0,0 +1,80 @@
+"""
+Benchmark: aggregate EJV scoring in-thread vs. on the process pool.
+
+Scores N synthetic stores against one fixed economic context (no Census
+calls) with app.score_stores_v1:
+- in-thread, with a cold and a warm store-profile cache
+- on aggregate_pool with 2, 4, ... up to the CPU count workers
+
+Pool timings exclude worker start-up (each pool is warmed with one job
+first) and every pooled result is checked against the in-thread result.
+
+Run from the repo root:
+
+    python benchmarks/bench_aggregate_pool.py [--stores 200000] [--chunk 5000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+os.environ.setdefault('VERCEL', '1')  # In-memory user database
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+import aggregate_pool
+
+CONTEXT = {
+    "zip_code": "10001",
+    "state_fips": "36",
+    "county_fips": "061",
+    "tract_fips": "009900",
+    "unemployment_rate": 4.1,
+    "median_income": 61409,
+    "tract_median_income": 48250,
+}
+STORE_TYPES = ("supermarket", "pharmacy", "fuel", "cafe", "")
+
+
+def timed(fn):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stores', type=int, default=200000)
+    parser.add_argument('--chunk', type=int, default=5000)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    store_ids = [f"{STORE_TYPES[i % len(STORE_TYPES)]}_{i}" for i in range(args.stores)]
+    app.store_profile_cache.maxsize = args.stores
+    print(f"{args.stores} stores, {cpus} CPU(s), chunk {args.chunk}")
+
+    aggregate_pool.WORKERS = 0
+    app.store_profile_cache.clear()
+    cold, expected = timed(lambda: app.score_stores_v1(store_ids, CONTEXT))
+    warm, _ = timed(lambda: app.score_stores_v1(store_ids, CONTEXT))
+    print(f"{'in-thread (cold profiles)':<28} {cold:.3f}s")
+    print(f"{'in-thread (warm profiles)':<28} {warm:.3f}s")
+
+    aggregate_pool.MIN_STORES = 0
+    aggregate_pool.CHUNK_SIZE = args.chunk
+    workers = 2
+    while True:
+        aggregate_pool.WORKERS = min(workers, cpus) if cpus > 1 else 2
+        timed(lambda: app.score_stores_v1(store_ids[:args.chunk], CONTEXT))  # Start the workers
+        elapsed, result = timed(lambda: app.score_stores_v1(store_ids, CONTEXT))
+        status = "ok" if result == expected else "MISMATCH"
+        print(f"{f'pool, {aggregate_pool.WORKERS} workers':<28} {elapsed:.3f}s  "
+              f"({cold / elapsed:.2f}x vs cold in-thread)  {status}")
+        aggregate_pool.shutdown()
+        if aggregate_pool.WORKERS >= cpus:
+            break
+        workers *= 2
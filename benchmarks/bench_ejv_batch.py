@@ -0,0 +1,101 @@
+"""
+Benchmark: vectorized EJV batch engine vs. the scalar scoring functions.
+
+Scores N stores with random payrolls and economic contexts (no Census calls)
+through scoring.score_ejv_v1 / score_ejv_v2 one store at a time, and through
+ejv_batch.score_payrolls in one call, then checks that every field the batch
+engine returns equals the scalar result exactly. Exits with status 1 on any
+mismatch, so it doubles as the parity check for ejv_batch.py.
+
+Run from the repo root:
+
+    python benchmarks/bench_ejv_batch.py [--stores 100000] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ejv_batch
+import scoring
+
+V1_FIELDS = ("EJV", "wage_score", "hiring_score", "community_score", "participation_score",
+             "wealth_retained", "wealth_leakage", "living_wage", "local_hire_pct")
+V2_FIELDS = ("EJV", "ejv_v2", "local_capture", "justice_score_zip", "wage_score", "hiring_score",
+             "community_score", "participation_score", "wealth_retained", "wealth_leakage", "living_wage")
+V2_DICT_FIELDS = ("zip_modifiers", "dimensions", "adjusted_dimensions")
+
+
+def random_store(rng):
+    """(payroll, economic context) spanning the ranges get_payroll_data produces"""
+    avg_wage = round(rng.uniform(9, 30), 2)
+    active_employees = rng.randint(3, 120)
+    daily_payroll = round(active_employees * avg_wage * 8, 2)
+    payroll = {
+        "avg_wage": avg_wage,
+        "active_employees": active_employees,
+        "daily_payroll": daily_payroll,
+        "local_hire_pct": round(rng.uniform(0.4, 0.98), 2),
+        "community_spend_today": round(daily_payroll * rng.uniform(0.005, 0.255), 2),
+    }
+    context = {
+        "unemployment_rate": round(rng.uniform(1, 15), 1),
+        "median_income": rng.randint(20000, 150000),
+        "tract_median_income": rng.randint(15000, 200000),
+    }
+    return payroll, context
+
+
+def mismatches(payrolls, contexts, batch):
+    """[(store index, field, scalar value, batch value)] for every differing field"""
+    found = []
+    for i, (payroll, context) in enumerate(zip(payrolls, contexts)):
+        v1 = scoring.score_ejv_v1(payroll, context)
+        v2 = scoring.score_ejv_v2(payroll, context)
+        for field in V1_FIELDS:
+            if v1[field] != float(batch["v1"][field][i]):
+                found.append((i, f"v1.{field}", v1[field], float(batch["v1"][field][i])))
+        for field in V2_FIELDS:
+            if v2[field] != float(batch["v2"][field][i]):
+                found.append((i, f"v2.{field}", v2[field], float(batch["v2"][field][i])))
+        for field in V2_DICT_FIELDS:
+            for dim, value in v2[field].items():
+                if value != float(batch["v2"][field][dim][i]):
+                    found.append((i, f"v2.{field}.{dim}", value, float(batch["v2"][field][dim][i])))
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--stores', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stores = [random_store(rng) for _ in range(args.stores)]
+    payrolls = [payroll for payroll, _ in stores]
+    contexts = [context for _, context in stores]
+    store_ids = list(range(args.stores))
+    print(f"{args.stores} stores")
+
+    start = time.perf_counter()
+    for payroll, context in stores:
+        scoring.score_ejv_v1(payroll, context)
+        scoring.score_ejv_v2(payroll, context)
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = ejv_batch.score_payrolls(store_ids, payrolls, contexts)
+    vectorized = time.perf_counter() - start
+
+    print(f"{'scalar (v1 + v2)':<20} {scalar:.3f}s")
+    print(f"{'ejv_batch':<20} {vectorized:.3f}s  ({scalar / vectorized:.1f}x)")
+
+    found = mismatches(payrolls, contexts, batch)
+    for i, field, expected, actual in found[:10]:
+        print(f"MISMATCH store {i} {field}: scalar {expected!r}, batch {actual!r}")
+    print(f"parity: {'ok' if not found else f'{len(found)} mismatches'}")
+    sys.exit(1 if found else 0)
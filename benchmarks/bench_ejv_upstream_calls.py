@@ -0,0 +1,108 @@
+"""
+Benchmark: upstream calls and latency of one /api/ejv score.
+
+Replaces the Census API with an in-process stand-in that counts calls, then
+scores the same store through:
+- separate calculators: calculate_ejv + calculate_ejv_v2, each resolving its
+  own inputs with cold caches (how the endpoints used to score)
+- GET /api/ejv and /api/ejv-comparison (fused calculate_ejv_both), cold and warm
+
+The offline ACS snapshot is disabled so every lookup would reach the API.
+
+Run from the repo root:
+
+    python benchmarks/bench_ejv_upstream_calls.py [--requests 500]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+os.environ['ACS_SNAPSHOT_PATH'] = os.devnull + '.missing'
+os.environ['CENSUS_BATCH_WINDOW_MS'] = '0'
+os.environ.setdefault('VERCEL', '1')  # In-memory user database
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+calls = []
+
+
+class StandInResponse:
+    status_code = 200
+    ok = True
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def stand_in_census(url, params=None, timeout=None, **kwargs):
+    calls.append(url)
+    geography = params['for']
+    if geography.startswith('zip code tabulation area:'):
+        zips = geography.split(':', 1)[1].split(',')
+        return StandInResponse(
+            [["NAME", "DP03_0005PE", "DP03_0062E", "zip code tabulation area"]]
+            + [[f"ZCTA5 {z}", "4.1", "61409", z] for z in zips]
+        )
+    return StandInResponse([["NAME", "B19013_001E", "state", "county", "tract"],
+                            ["Tract", "48250", "01", "089", "010100"]])
+
+
+def reset_caches():
+    app.zcta_cache.clear()
+    app.county_tract_cache.clear()
+    app.store_profile_cache.clear()
+
+
+def count_calls(fn):
+    before = len(calls)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    return len(calls) - before
+
+
+def timed(label, fn, n):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed / n * 1000:.3f} ms/score")
+
+
+def separate_calculators():
+    reset_caches()
+    app.calculate_ejv('supermarket_42', zip_code='10001')
+    reset_caches()
+    app.calculate_ejv_v2('supermarket_42', zip_code='10001')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    app.http_client.get = stand_in_census
+    client = app.app.test_client()
+
+    print("Upstream Census calls per score")
+    print(f"  separate calculators, cold caches:  {count_calls(separate_calculators)}")
+    for path in ('/api/ejv/supermarket_42?zip=10001', '/api/ejv-comparison/supermarket_42?zip=10001'):
+        reset_caches()
+        cold = count_calls(lambda: client.get(path))
+        warm = count_calls(lambda: client.get(path))
+        print(f"  {path.split('/supermarket')[0]:<20} cold: {cold}  warm: {warm}")
+
+    print("Latency (warm caches)")
+    timed("  calculate_ejv + calculate_ejv_v2", lambda: (
+        app.calculate_ejv('supermarket_42', zip_code='10001'),
+        app.calculate_ejv_v2('supermarket_42', zip_code='10001')
+    ), args.requests)
+    timed("  calculate_ejv_both", lambda: app.calculate_ejv_both('supermarket_42', zip_code='10001'), args.requests)
@@ -0,0 +1,85 @@
+"""
+Benchmark: pooled keep-alive client vs. one-off requests.get calls.
+
+Starts a local HTTPS stand-in for an upstream API (self-signed certificate
+generated with the openssl CLI) and times N sequential GETs through:
+- requests.get (new TCP+TLS handshake per call, as before http_client)
+- http_client.get (per-host pooled keep-alive session)
+
+Run from the repo root:
+
+    python benchmarks/bench_http_pool.py [--requests 200]
+"""
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import http_client
+
+PAYLOAD = b'[["NAME","DP03_0005PE","DP03_0062E","zip code tabulation area"],["ZCTA5 10001","4.1","101409","10001"]]'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections open between requests
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_https_server(cert_dir):
+    cert, key = os.path.join(cert_dir, 'cert.pem'), os.path.join(cert_dir, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=localhost', '-keyout', key, '-out', cert
+    ], check=True, capture_output=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(label, fn, url, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(url, verify=False, timeout=10).raise_for_status()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n} requests in {elapsed:.3f}s  ({elapsed / n * 1000:.2f} ms/request)")
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')  # Self-signed certificate warnings
+
+    with tempfile.TemporaryDirectory() as cert_dir:
+        server = start_https_server(cert_dir)
+        url = f"https://127.0.0.1:{server.server_address[1]}/data/2022/acs/acs5/profile"
+
+        one_off = timed("requests.get (no pooling)", requests.get, url, args.requests)
+        pooled = timed("http_client.get (pooled)", http_client.get, url, args.requests)
+        print(f"Speedup: {one_off / pooled:.1f}x")
+
+        http_client.close_all()
+        server.shutdown()
@@ -0,0 +1,145 @@
+"""
+Benchmark: time-to-first-byte and memory of one /api/overpass reply.
+
+Serves a synthetic Overpass result of N elements from a local stand-in mirror
+(gzip-compressed, as mirrors answer our requests, and written in 64 KiB chunks
+with a small delay per chunk to mimic the network) and produces the proxy's
+reply body through:
+- buffered: response.json(), count the elements, jsonify(data) again (how
+  overpass_proxy used to answer)
+- streamed: overpass.stream_query, body decompressed and passed on in chunks
+- streamed, gzip passthrough: the same for a client that accepts gzip
+
+The result cache is cleared before every request, so each one goes upstream.
+Time to first byte is measured without tracemalloc, peak memory in a
+separate run with it (streamed peaks include the copy kept for the cache).
+
+Run from the repo root:
+
+    python benchmarks/bench_overpass_stream.py [--elements 50000] [--requests 5] [--throttle-ms 1]
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('VERCEL', '1')  # In-memory user database
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+import http_client
+import overpass
+
+QUERY = '[out:json][timeout:25];(node["shop"](40.6,-74.1,40.8,-73.9);way["shop"](40.6,-74.1,40.8,-73.9););out center;'
+CHUNK = 64 * 1024
+
+
+def synthetic_result(elements):
+    return json.dumps({
+        "version": 0.6,
+        "generator": "stand-in",
+        "elements": [
+            {"type": "node", "id": i, "lat": 40.6 + (i % 1000) / 5000, "lon": -74.1 + (i // 1000) / 5000,
+             "tags": {"shop": "convenience", "name": f"Store {i}", "addr:postcode": "10001"}}
+            for i in range(elements)
+        ]
+    }, indent=1).encode()
+
+
+def stand_in_mirror(body, throttle):
+    compressed = gzip.compress(body)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            payload = memoryview(compressed if use_gzip else body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            if use_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.end_headers()
+            for start in range(0, len(payload), CHUNK):
+                self.wfile.write(payload[start:start + CHUNK])
+                time.sleep(throttle)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/api/interpreter"
+
+
+def buffered_reply(accept_gzip):
+    """The previous proxy path; yields the whole body once it is encoded"""
+    response = http_client.post(overpass.MIRRORS[0], data=QUERY, timeout=30, headers={'Accept': 'application/json'})
+    data = response.json()
+    len(data.get('elements', []))
+    with app.app.app_context():
+        yield app.jsonify(data).get_data()
+
+
+def streamed_reply(accept_gzip):
+    overpass.result_cache.clear()
+    body, _ = overpass.stream_query(QUERY, accept_gzip=accept_gzip)
+    try:
+        yield from body
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def measure(reply, accept_gzip, requests, trace):
+    """(mean time to first byte, mean total time, bytes sent, peak traced memory)"""
+    first_byte = total = peak = 0.0
+    sent = 0
+    for _ in range(requests):
+        if trace:
+            tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            chunks = reply(accept_gzip)
+            chunk = next(chunks)
+            first_byte += time.perf_counter() - start
+            sent = len(chunk) + sum(len(chunk) for chunk in chunks)
+            total += time.perf_counter() - start
+        if trace:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return first_byte / requests, total / requests, sent, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--elements', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--throttle-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    body = synthetic_result(args.elements)
+    overpass.MIRRORS[:] = [stand_in_mirror(body, args.throttle_ms / 1000)]
+    overpass.health = overpass.MirrorHealth(overpass.MIRRORS)
+    print(f"{args.elements} elements, {len(body) / 1e6:.1f} MB JSON, {args.requests} requests per path")
+
+    print(f"{'path':<30} {'TTFB':>10} {'total':>10} {'sent':>10} {'peak memory':>12}")
+    for label, reply, accept_gzip in (
+        ("buffered (json + jsonify)", buffered_reply, False),
+        ("streamed", streamed_reply, False),
+        ("streamed, gzip passthrough", streamed_reply, True),
+    ):
+        first_byte, total, sent, _ = measure(reply, accept_gzip, args.requests, trace=False)
+        _, _, _, peak = measure(reply, accept_gzip, 1, trace=True)
+        print(f"{label:<30} {first_byte * 1000:>8.1f}ms {total * 1000:>8.1f}ms "
+              f"{sent / 1e6:>8.2f}MB {peak / 1e6:>10.1f}MB")
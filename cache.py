@@ -0,0 +1,137 @@
+"""
+In-process caches for upstream API responses.
+
+TTLCache is a bounded, thread-safe LRU cache with a per-entry TTL and
+stale-while-revalidate: once an entry expires it keeps being served while a
+single background thread refreshes it, so hot keys never wait on the upstream
+API again after their first load. Concurrent misses for the same key are
+coalesced into a single load.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and stale-while-revalidate"""
+
+    def __init__(self, name, maxsize=1024, ttl=3600, max_stale=None):
+        """
+        name:      label used in log lines and stats
+        maxsize:   entries kept before least-recently-used eviction
+        ttl:       seconds an entry is fresh
+        max_stale: seconds past expiry an entry may still be served while it
+                   refreshes (None = until evicted)
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (value, is_fresh), or (None, False) on a miss or an entry past max_stale"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            value, expires_at = entry
+            if self.max_stale is not None and now > expires_at + self.max_stale:
+                del self._entries[key]
+                return None, False
+            self._entries.move_to_end(key)
+            return value, now < expires_at
+
+    def set(self, key, value, ttl=None):
+        """Store value for key, evicting least-recently-used entries past maxsize"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_cached(self, key, loader):
+        """
+        Return the cached value for key without loading it on a miss (returns None).
+        Expired entries are returned immediately and refreshed in the background.
+        """
+        value, fresh = self.get(key)
+        if value is None:
+            self.misses += 1
+        elif fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            self._refresh_in_background(key, loader)
+        return value
+
+    def get_or_load(self, key, loader, timeout=None):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        Expired entries are returned immediately and refreshed in the background.
+        Concurrent misses for the same key wait (up to timeout seconds, then
+        TimeoutError) on one shared loader() call.
+        A loader result of None means "lookup failed" and is never cached.
+        """
+        value = self.get_cached(key, loader)
+        if value is not None:
+            return value
+
+        def load():
+            # Another caller may have filled the entry while we waited to lead
+            value, _ = self.get(key)
+            if value is not None:
+                return value
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+            return value
+
+        return self._flight.do(key, load, timeout)
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value)
+            except Exception as e:
+                print(f"{self.name} cache refresh error for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self._flight.shared
+        }
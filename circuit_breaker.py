@@ -0,0 +1,99 @@
+"""
+Circuit breaker for upstream APIs.
+
+After failure_threshold consecutive failures (errors, timeouts, 5xx responses)
+the breaker opens and calls fail fast with CircuitOpenError instead of waiting
+on a struggling upstream. Once recovery_timeout has passed it goes half-open
+and lets a single probe through: success closes it again, failure re-opens it.
+"""
+import threading
+import time
+from datetime import datetime
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._last_failure = None
+        self.total_failures = 0
+        self.rejected = 0
+
+    def is_open(self):
+        """True while calls should fail fast (open and not yet due for a probe)"""
+        with self._lock:
+            return self._state == OPEN and time.monotonic() - self._opened_at < self.recovery_timeout
+
+    def allow_request(self):
+        """Return True if a call may go upstream now; half-open allows one probe at a time"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                print(f"{self.name} circuit half-open: probing upstream")
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"[OK] {self.name} circuit closed: upstream recovered")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """Finish an allowed call without judging the upstream (e.g. our own deadline ran out)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self, reason=""):
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            self._last_failure = {"reason": str(reason)[:200], "at": datetime.now().isoformat()}
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"[FAIL] {self.name} circuit open after {self._failures} failure(s): {reason}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def status(self):
+        with self._lock:
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0.0, round(self.recovery_timeout - (time.monotonic() - self._opened_at), 1))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "retry_in_seconds": retry_in,
+                "total_failures": self.total_failures,
+                "rejected_calls": self.rejected,
+                "last_failure": self._last_failure
+            }
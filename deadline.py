@@ -0,0 +1,67 @@
+"""
+Per-request time budgets for upstream calls.
+
+A request starts with a deadline (see start()); every upstream call made while
+handling it asks timeout_for() for its timeout, which is the smaller of the
+call's own timeout and the budget still remaining. Once the budget is spent,
+timeout_for() raises DeadlineExceeded so callers fall back to cached or default
+data, and record that with mark_degraded() so the response can say so.
+
+State lives in context variables, so each request thread sees its own budget;
+background threads (cache refreshes, batch flushes) run without one.
+"""
+import time
+from contextvars import ContextVar
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the current request's time budget has run out"""
+
+
+_deadline = ContextVar('request_deadline', default=None)
+_degraded = ContextVar('request_degraded', default=None)
+
+
+def start(seconds):
+    """Give the current request a budget of seconds"""
+    _deadline.set(time.monotonic() + seconds)
+    _degraded.set([])
+
+
+def clear():
+    _deadline.set(None)
+    _degraded.set(None)
+
+
+def remaining():
+    """Seconds left in the current budget, or None if there is no deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout_for(timeout):
+    """Return the timeout to use for an upstream call, capped by the remaining budget"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+def mark_degraded(reason):
+    """Record that the current response uses fallback data"""
+    reasons = _degraded.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+
+def degraded_reasons():
+    return list(_degraded.get() or [])
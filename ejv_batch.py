@@ -0,0 +1,162 @@
+"""
+Vectorized EJV v1/v2 batch engine (NumPy).
+
+Scores many stores at once from columnar inputs instead of calling
+calculate_ejv / calculate_ejv_v2 once per store. Every formula mirrors the
+scalar functions in scoring.py (wage_score, hiring_score, community_score,
+participation_score, zip_need_modifier, score_ejv_v1, score_ejv_v2),
+including clamping and the order of floating-point operations, and outputs
+are rounded exactly as Python's round() does, so results equal the scalar
+path's. Keep the two in sync when a formula changes;
+benchmarks/bench_ejv_batch.py checks the parity.
+"""
+import numpy as np
+
+from scoring import (
+    DIMENSIONS,
+    LIVING_WAGE_FACTOR,
+    LIVING_WAGE_HOURS,
+    NEED_MODIFIER_WEIGHTS,
+    PARTICIPATION_BENCHMARK,
+    SVI,
+)
+
+
+def _column(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _round(values, digits):
+    """
+    Python's round() over an array. np.round scales by 10**digits before
+    rounding, so it can land on the other side of a half-way point (17.425
+    -> 17.42 vs 17.43); those values are rounded again with round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, digits)
+    scaled = values * 10.0 ** digits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(value, digits) for value in values[near_half].tolist()]
+    return rounded
+
+
+def need_modifiers(unemployment_rate, median_income):
+    """Vectorized get_zip_need_modifier: {dimension: array of NM in [0.80, 1.10]}"""
+    unemployment = _column(unemployment_rate)
+    income = _column(median_income)
+    unemployment_factor = np.minimum(unemployment / 10.0, 1.0)
+    income_factor = np.maximum(0, 1 - (income / 75000))
+    base_modifier = 0.80 + (0.30 * ((unemployment_factor + income_factor) / 2))
+    return {
+        dim: _round(np.minimum(1.10, np.maximum(0.80, base_modifier * weight)), 2)
+        for dim, weight in NEED_MODIFIER_WEIGHTS.items()
+    }
+
+
+def score_batch(store_ids, avg_wage, active_employees, local_hire_pct, community_spend,
+                unemployment_rate, zip_median_income, tract_median_income,
+                daily_payroll=None, purchase_amount=100.0):
+    """
+    Score a batch of stores.
+
+    Store columns (one entry per store): store_ids, avg_wage, active_employees,
+    local_hire_pct, community_spend (community_spend_today), and optionally
+    daily_payroll (computed as round(employees × wage × 8, 2) when omitted).
+    Context columns (one entry per store, usually broadcast from a per-ZIP
+    table): unemployment_rate and zip_median_income from the ZCTA,
+    tract_median_income from the tract.
+
+    Returns {"store_ids", "v1": {...}, "v2": {...}} where each field is an
+    array holding what calculate_ejv / calculate_ejv_v2 return for that store.
+    """
+    wage = _column(avg_wage)
+    employees = _column(active_employees)
+    lc = _column(local_hire_pct)
+    spend = _column(community_spend)
+    payroll = _round(employees * wage * 8, 2) if daily_payroll is None else _column(daily_payroll)
+    tract_income = _column(tract_median_income)
+
+    lw = (tract_income / LIVING_WAGE_HOURS) * LIVING_WAGE_FACTOR
+
+    # EJV v1 component scores (0-25 each)
+    w_score = np.minimum(25, (wage / lw) * 25)
+    h_score = np.minimum(25, lc * 25 * (1 + SVI))
+    c_score = np.minimum(25, (spend / payroll) * 25)
+    p_score = np.minimum(25, (employees / PARTICIPATION_BENCHMARK) * 25)
+    ejv_v1 = w_score + h_score + c_score + p_score
+
+    wealth_retained = payroll * lc + spend
+    wealth_leakage = payroll * (1 - lc)
+
+    # EJV v2: normalized dimensions, ZIP need modifiers, justice score
+    w = w_score / 25
+    h = h_score / 25
+    c = c_score / 25
+    p = p_score / 25
+    dimensions = {
+        "AES": c, "ART": w, "HWI": h, "PSR": c, "CAI": p,
+        "JCE": h, "FSI": w, "CED": (c + p) / 2, "ESD": h,
+    }
+    modifiers = need_modifiers(unemployment_rate, zip_median_income)
+    adjusted = dict(dimensions)
+    for dim, nm in modifiers.items():
+        adjusted[dim] = np.minimum(1.0, np.maximum(0.0, dimensions[dim] * nm))
+
+    # Same summation order as sum(adjusted_dimensions.values()) in the scalar path
+    js_total = adjusted[DIMENSIONS[0]]
+    for dim in DIMENSIONS[1:]:
+        js_total = js_total + adjusted[dim]
+    js_zip = js_total / len(DIMENSIONS) * 100
+    ejv_v2 = (purchase_amount * lc) * (js_zip / 100)
+    ejv_v1_normalized = (w + h + c + p) * 25
+
+    return {
+        "store_ids": list(store_ids),
+        "v1": {
+            "EJV": _round(ejv_v1, 2),
+            "wage_score": _round(w_score, 2),
+            "hiring_score": _round(h_score, 2),
+            "community_score": _round(c_score, 2),
+            "participation_score": _round(p_score, 2),
+            "wealth_retained": _round(wealth_retained, 2),
+            "wealth_leakage": _round(wealth_leakage, 2),
+            "living_wage": _round(lw, 2),
+            "local_hire_pct": lc,
+        },
+        "v2": {
+            "EJV": _round(ejv_v1_normalized, 2),
+            "ejv_v2": _round(ejv_v2, 2),
+            "local_capture": _round(lc, 3),
+            "justice_score_zip": _round(js_zip, 2),
+            "zip_modifiers": modifiers,
+            "dimensions": {dim: _round(values, 3) for dim, values in dimensions.items()},
+            "adjusted_dimensions": {dim: _round(values, 3) for dim, values in adjusted.items()},
+            "wage_score": _round(w * 25, 2),
+            "hiring_score": _round(h * 25, 2),
+            "community_score": _round(c * 25, 2),
+            "participation_score": _round(p * 25, 2),
+            "wealth_retained": _round(wealth_retained, 2),
+            "wealth_leakage": _round(wealth_leakage, 2),
+            "living_wage": _round(lw, 2),
+        },
+    }
+
+
+def score_payrolls(store_ids, payrolls, contexts, purchase_amount=100.0):
+    """
+    Convenience wrapper: score stores from get_payroll_data dicts and the
+    matching economic contexts (see resolve_economic_context in app.py).
+    """
+    return score_batch(
+        store_ids,
+        avg_wage=[pr["avg_wage"] for pr in payrolls],
+        active_employees=[pr["active_employees"] for pr in payrolls],
+        local_hire_pct=[pr["local_hire_pct"] for pr in payrolls],
+        community_spend=[pr["community_spend_today"] for pr in payrolls],
+        daily_payroll=[pr["daily_payroll"] for pr in payrolls],
+        unemployment_rate=[ctx["unemployment_rate"] for ctx in contexts],
+        zip_median_income=[ctx["median_income"] for ctx in contexts],
+        tract_median_income=[ctx["tract_median_income"] for ctx in contexts],
+        purchase_amount=purchase_amount,
+    )
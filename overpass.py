@@ -0,0 +1,666 @@
+"""
+Hedged, health-ranked Overpass API client for the store-search proxy.
+
+fetch() sends a query to the first mirror and, if no good answer has arrived
+after HEDGE_DELAY, fires the same query at the next mirror, with at most
+HEDGE_FANOUT requests in flight. The first 200 response wins: backups that
+have not started yet are cancelled, and responses still in flight are closed
+unread when they arrive. A mirror that fails (429, 5xx, timeout, connection
+error) frees its slot at once, so the next mirror starts without waiting
+out the hedge delay.
+
+Mirrors are tried in the order given by MirrorHealth, which tracks an EWMA of
+each mirror's latency and its recent 429/503/504/timeout counts, and ranks
+them by expected time to a good answer (latency / recent success rate).
+Mirrors that keep failing, or that rate-limit us, are put in a cooldown and
+only tried after every healthy mirror. Outcomes of abandoned hedges are still
+recorded when they arrive, so slow mirrors are measured too.
+
+Mirror requests run on a shared thread pool and carry the calling request's
+deadline (see deadline.py), so no mirror is waited on past it. An abandoned
+hedge keeps its thread until the mirror answers or OVERPASS_TIMEOUT passes,
+so every search can hold up to HEDGE_FANOUT threads for that long. The pool
+is therefore sized HEDGE_FANOUT x OVERPASS_CONCURRENCY. A smaller pool would
+queue new searches' primary requests behind dead hedges, and the hedge delay
+would stop meaning anything.
+
+stream_query() puts a result cache in front of fetch(), keyed by the query's
+canonical form: whitespace outside string literals normalized, the [timeout:]
+setting removed (it does not change the result) and decimal numbers such as
+coordinates rounded to OVERPASS_CACHE_COORD_DECIMALS places, so the same
+search typed twice, or a few metres apart, is answered from memory.
+Concurrent identical queries share one upstream fetch, unless its result
+turns out not to be cacheable (too large, a "remark", broken): the waiting
+requests are then let go at once to fetch their own copies in parallel.
+
+On a miss the winning mirror's body is streamed to the client in chunks as
+it arrives, never parsed or re-encoded, and a gzip body is passed through
+compressed when the client accepts gzip. The chunks are copied into the
+result cache on the way (bodies up to OVERPASS_CACHE_MAX_BYTES), and cached
+once complete only if the chunks, scanned as they pass, carried no
+runtime-error "remark" key (a timed-out query also answers 200) and the body
+ends the way a JSON result does ("]}"). Bodies are never parsed whole.
+
+Configuration (environment variables):
+- OVERPASS_HEDGE_DELAY_MS: wait before firing a backup request (default 1500)
+- OVERPASS_HEDGE_FANOUT:   mirrors queried in parallel at most (default 3; 1 = plain failover)
+- OVERPASS_TIMEOUT:        per-mirror timeout in seconds (default 30)
+- OVERPASS_CONCURRENCY:    concurrent store searches the mirror-request pool is sized for (default 32)
+- OVERPASS_THREADS:        shared mirror-request threads (default HEDGE_FANOUT x OVERPASS_CONCURRENCY)
+- OVERPASS_HEALTH_WINDOW:  seconds of outcomes counted as recent (default 300)
+- OVERPASS_COOLDOWN:       first cooldown after repeated failures, seconds (default 30)
+- OVERPASS_COOLDOWN_MAX:   longest cooldown, seconds (default 600)
+- OVERPASS_CACHE_SIZE:     cached query results (default 256)
+- OVERPASS_CACHE_TTL:      seconds a cached result is served (default 900)
+- OVERPASS_CACHE_COORD_DECIMALS: decimals coordinates are rounded to in cache keys (default 4, ~11 m)
+- OVERPASS_CACHE_MAX_BYTES: largest response body cached (default 4 MiB)
+- OVERPASS_STREAM_CHUNK:   bytes per streamed chunk (default 65536)
+- OVERPASS_COUNT_SAMPLE:   share of gzip passthrough responses decompressed to count elements for the log (default 0.1)
+- OVERPASS_COALESCE_WAIT:  seconds a request waits on an identical in-flight stream before fetching its own (default 10)
+"""
+import contextvars
+import gzip
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+import deadline
+import http_client
+from cache import TTLCache
+
+HEDGE_DELAY = float(os.environ.get('OVERPASS_HEDGE_DELAY_MS', 1500)) / 1000
+HEDGE_FANOUT = int(os.environ.get('OVERPASS_HEDGE_FANOUT', 3))
+REQUEST_TIMEOUT = float(os.environ.get('OVERPASS_TIMEOUT', 30))
+CONCURRENCY = int(os.environ.get('OVERPASS_CONCURRENCY', 32))
+THREADS = int(os.environ.get('OVERPASS_THREADS', max(1, HEDGE_FANOUT) * CONCURRENCY))
+HEALTH_WINDOW = float(os.environ.get('OVERPASS_HEALTH_WINDOW', 300))
+COOLDOWN = float(os.environ.get('OVERPASS_COOLDOWN', 30))
+COOLDOWN_MAX = float(os.environ.get('OVERPASS_COOLDOWN_MAX', 600))
+CACHE_SIZE = int(os.environ.get('OVERPASS_CACHE_SIZE', 256))
+CACHE_TTL = int(os.environ.get('OVERPASS_CACHE_TTL', 900))
+COORD_DECIMALS = int(os.environ.get('OVERPASS_CACHE_COORD_DECIMALS', 4))
+CACHE_MAX_BYTES = int(os.environ.get('OVERPASS_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+STREAM_CHUNK = int(os.environ.get('OVERPASS_STREAM_CHUNK', 64 * 1024))
+COUNT_SAMPLE = float(os.environ.get('OVERPASS_COUNT_SAMPLE', 0.1))
+COALESCE_WAIT = float(os.environ.get('OVERPASS_COALESCE_WAIT', 10))
+
+# Multiple backup servers with different endpoints (8 servers for better reliability)
+MIRRORS = [
+    'https://overpass.kumi.systems/api/interpreter',  # Often fastest
+    'https://overpass-api.de/api/interpreter',        # Main instance
+    'https://overpass.openstreetmap.ru/api/interpreter',
+    'https://overpass.openstreetmap.fr/api/interpreter',
+    'https://overpass.nchc.org.tw/api/interpreter',   # Taiwan mirror
+    'https://maps.mail.ru/osm/tools/overpass/api/interpreter',  # Russia
+    'https://overpass.openstreetmap.ie/api/interpreter',  # Ireland
+    'https://overpass-turbo.eu/api/interpreter'       # EU mirror
+]
+
+DEADLINE_ERROR = "Request deadline exceeded"
+
+# Outcome kinds recorded per mirror request
+OK = "ok"
+RATE_LIMITED = "rate_limited"
+UNAVAILABLE = "unavailable"
+GATEWAY_TIMEOUT = "gateway_timeout"
+TIMED_OUT = "timeout"
+ERROR = "error"
+DEADLINE = "deadline"  # Our own budget ran out: says nothing about the mirror
+FAILURE_KINDS = (RATE_LIMITED, UNAVAILABLE, GATEWAY_TIMEOUT, TIMED_OUT, ERROR)
+
+EWMA_ALPHA = 0.3
+PRIOR_LATENCY = 2.0  # Seconds assumed for a mirror with no measurements yet
+FAILURES_BEFORE_COOLDOWN = 3
+
+
+class MirrorHealth:
+    """Per-mirror latency EWMA, recent outcomes and failure cooldowns"""
+
+    def __init__(self, servers):
+        self._lock = threading.Lock()
+        self._mirrors = {}
+        for server in servers:
+            self._mirror(server)
+
+    def _mirror(self, server):
+        mirror = self._mirrors.get(server)
+        if mirror is None:
+            mirror = self._mirrors[server] = {
+                "order": len(self._mirrors),
+                "ewma_latency": None,
+                "recent": deque(maxlen=256),  # (time, kind)
+                "consecutive_failures": 0,
+                "cooldown_until": 0.0,
+                "cooldowns": 0,
+                "last_error": None
+            }
+        return mirror
+
+    def record(self, server, kind, latency=None, error=None):
+        """Record the outcome of one request to server"""
+        if kind == DEADLINE:
+            return
+        now = time.monotonic()
+        with self._lock:
+            mirror = self._mirror(server)
+            mirror["recent"].append((now, kind))
+            if latency is not None:
+                previous = mirror["ewma_latency"]
+                mirror["ewma_latency"] = latency if previous is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * previous
+
+            if kind == OK:
+                mirror["consecutive_failures"] = 0
+                mirror["cooldowns"] = 0
+                mirror["cooldown_until"] = 0.0
+                return
+
+            mirror["consecutive_failures"] += 1
+            mirror["last_error"] = error or kind
+            # A 429 means our slots on that mirror are used up: back off at once
+            if kind == RATE_LIMITED or mirror["consecutive_failures"] >= FAILURES_BEFORE_COOLDOWN:
+                cooldown = min(COOLDOWN_MAX, COOLDOWN * 2 ** mirror["cooldowns"])
+                mirror["cooldowns"] += 1
+                mirror["cooldown_until"] = now + cooldown
+                mirror["consecutive_failures"] = 0
+                print(f"[FAIL] Overpass mirror cooling down for {cooldown:.0f}s: {server} ({mirror['last_error']})")
+
+    def _recent_counts(self, mirror, now):
+        counts = {kind: 0 for kind in (OK,) + FAILURE_KINDS}
+        for at, kind in mirror["recent"]:
+            if now - at <= HEALTH_WINDOW:
+                counts[kind] += 1
+        return counts
+
+    def _score(self, mirror, counts):
+        """Expected seconds to a good answer: latency / recent success rate"""
+        latency = PRIOR_LATENCY if mirror["ewma_latency"] is None else mirror["ewma_latency"]
+        total = sum(counts.values())
+        success_rate = (counts[OK] + 1) / (total + 1)  # One assumed success keeps new mirrors from scoring zero
+        return latency / success_rate
+
+    def _ranking(self):
+        now = time.monotonic()
+        rows = []
+        for server, mirror in self._mirrors.items():
+            counts = self._recent_counts(mirror, now)
+            cooling = mirror["cooldown_until"] > now
+            rows.append((cooling, mirror["cooldown_until"] if cooling else 0.0,
+                         self._score(mirror, counts), mirror["order"], server, mirror, counts))
+        rows.sort(key=lambda row: row[:4])
+        return now, rows
+
+    def ranked(self):
+        """Mirrors best-first; mirrors in cooldown last, soonest-recovering first"""
+        with self._lock:
+            _, rows = self._ranking()
+            return [row[4] for row in rows]
+
+    def snapshot(self):
+        """Current ranking with the stats behind it (for diagnostics)"""
+        with self._lock:
+            now, rows = self._ranking()
+            return [{
+                "rank": rank,
+                "server": server,
+                "score_s": round(score, 3),
+                "ewma_latency_ms": None if mirror["ewma_latency"] is None else round(mirror["ewma_latency"] * 1000),
+                "recent": counts,
+                "consecutive_failures": mirror["consecutive_failures"],
+                "cooling_down": cooling,
+                "cooldown_remaining_s": round(cooldown_until - now, 1) if cooling else 0,
+                "last_error": mirror["last_error"]
+            } for rank, (cooling, cooldown_until, score, _, server, mirror, counts) in enumerate(rows, 1)]
+
+
+health = MirrorHealth(MIRRORS)
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='overpass')
+
+
+class OverpassUnavailable(Exception):
+    """Raised when no mirror returned a 200 within the request's budget"""
+
+    def __init__(self, last_error, servers_tried, servers_total):
+        super().__init__(last_error)
+        self.last_error = last_error
+        self.servers_tried = servers_tried
+        self.servers_total = servers_total
+
+    @property
+    def deadline_exceeded(self):
+        return self.last_error == DEADLINE_ERROR
+
+
+def _classify_status(status_code):
+    """(outcome kind, error message) for a mirror's HTTP status"""
+    if status_code == 200:
+        return OK, None
+    if status_code == 429:
+        return RATE_LIMITED, "Rate limited"
+    if status_code == 503:
+        return UNAVAILABLE, "Service unavailable (503)"
+    if status_code == 504:
+        return GATEWAY_TIMEOUT, "Gateway timeout - query too complex"
+    return ERROR, f"HTTP {status_code}"
+
+
+def _classify_error(error):
+    """(outcome kind, error message) for an exception raised by a mirror request"""
+    if isinstance(error, deadline.DeadlineExceeded):
+        return DEADLINE, DEADLINE_ERROR
+    if isinstance(error, requests.Timeout):
+        # A timeout cut short by our own budget says nothing about the mirror
+        return (DEADLINE, DEADLINE_ERROR) if deadline.expired() else (TIMED_OUT, "Connection timeout")
+    return ERROR, str(error)[:100]
+
+
+def _post(server, query):
+    """POST query to one mirror and record the outcome in health"""
+    started = time.monotonic()
+    try:
+        # stream=True: only the winning response's body is ever downloaded
+        response = http_client.post(
+            server,
+            data=query,
+            timeout=REQUEST_TIMEOUT,
+            stream=True,
+            headers={'Accept': 'application/json'}
+        )
+    except requests.RequestException as e:
+        kind, error = _classify_error(e)
+        health.record(server, kind, time.monotonic() - started if kind == TIMED_OUT else None, error)
+        raise
+
+    kind, error = _classify_status(response.status_code)
+    # Fast error pages would make a failing mirror look quick: only time good answers
+    health.record(server, kind, time.monotonic() - started if kind == OK else None, error)
+    return response
+
+
+def _submit(server, query):
+    # Each task runs in a copy of the caller's context so it sees the request deadline
+    return _executor.submit(contextvars.copy_context().run, _post, server, query)
+
+
+def _error_for(future):
+    """Describe why a finished mirror request failed, or None for a 200"""
+    try:
+        response = future.result()
+    except (deadline.DeadlineExceeded, requests.RequestException) as e:
+        return _classify_error(e)[1]
+
+    _, error = _classify_status(response.status_code)
+    if error is not None:
+        response.close()
+    return error
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _abandon(future):
+    """Cancel a mirror request that has not started, or close its response when it arrives"""
+    if not future.cancel():
+        future.add_done_callback(_close_response)
+
+
+def fetch(query, servers=None):
+    """
+    Run an Overpass query against the mirrors (healthiest first unless servers
+    is given), hedging slow ones. Returns (response, server) for the first 200; the caller reads and closes
+    the response. Raises OverpassUnavailable if every mirror failed or the
+    request's deadline ran out first.
+    """
+    servers = health.ranked() if servers is None else list(servers)
+    fanout = max(1, HEDGE_FANOUT)
+    pending = {}  # future -> (mirror number, server, started at)
+    next_index = 0
+    hedge_at = 0.0
+    last_error = None
+
+    try:
+        while True:
+            if deadline.expired():
+                last_error = DEADLINE_ERROR
+                break
+
+            now = time.monotonic()
+            can_launch = next_index < len(servers) and len(pending) < fanout
+            if can_launch and now >= hedge_at:
+                server = servers[next_index]
+                next_index += 1
+                kind = " (hedge)" if pending else ""
+                print(f"Trying Overpass server {next_index}/{len(servers)}{kind}: {server}")
+                pending[_submit(server, query)] = (next_index, server, now)
+                hedge_at = now + HEDGE_DELAY
+                continue
+
+            if not pending:
+                break  # Every mirror failed
+
+            wait_for = deadline.remaining()
+            if can_launch:
+                until_hedge = max(0.0, hedge_at - now)
+                wait_for = until_hedge if wait_for is None else min(wait_for, until_hedge)
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                number, server, started = pending.pop(future)
+                error = _error_for(future)
+                if error is None:
+                    print(f"[OK] Server {number} answered in {time.monotonic() - started:.2f}s")
+                    return future.result(), server
+                print(f"[FAIL] Server {number}: {error}")
+                last_error = error
+                hedge_at = 0.0  # A failed mirror frees its slot for the next one now
+    finally:
+        for future in pending:
+            _abandon(future)
+
+    raise OverpassUnavailable(last_error, next_index, len(servers))
+
+
+# ---------------------------------------
+# Query rewriting and result cache
+# ---------------------------------------
+
+# Query results expire outright: a store search should not be answered from an hour-old list
+result_cache = TTLCache("overpass", maxsize=CACHE_SIZE, ttl=CACHE_TTL, max_stale=0)
+
+# Cache key -> _StreamDone of the request streaming that query
+_streams = {}
+_streams_lock = threading.Lock()
+_coalesced = 0
+
+_STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+_TIMEOUT_SETTING = re.compile(r'\[timeout:\d+\]')
+_DECIMAL = re.compile(r'-?\d+\.\d+')
+_SPACE_AROUND_PUNCTUATION = re.compile(r' ?([^\w ]) ?')
+
+# Streamed bodies are checked for these without parsing them
+_REMARK = re.compile(rb'"remark"\s*:')
+_RESULT_END = re.compile(rb'\]\s*\}\s*$')
+SCAN_TAIL = 64
+
+
+class _StreamDone(threading.Event):
+    """Set when a leading stream ends, or as soon as its result is known to be uncacheable"""
+
+    def __init__(self):
+        super().__init__()
+        self.uncacheable = False
+
+
+def optimize_query(query):
+    """Lower the query's server timeout and cap its result count"""
+    # Optimize query - reduce timeout and add result limit if not present
+    if '[out:json]' in query and '[timeout:' not in query:
+        query = query.replace('[out:json]', '[out:json][timeout:25]')
+    elif '[timeout:30]' in query:
+        query = query.replace('[timeout:30]', '[timeout:25]')
+
+    # Add result limit if not present (prevent huge responses)
+    if 'out center' in query and not 'out center' in query.split(');')[1]:
+        query = query.replace('out center;', 'out center 100;')
+    return query
+
+
+def _round_decimal(match):
+    return f"{round(float(match.group()), COORD_DECIMALS):.{COORD_DECIMALS}f}"
+
+
+def canonical_query(query):
+    """Cache key for a query: queries with the same canonical form return the same data"""
+    parts = []
+    position = 0
+    # String literals (tag values, name regexes) are kept verbatim
+    for literal in _STRING_LITERAL.finditer(query):
+        parts.append(_canonical_code(query[position:literal.start()]))
+        parts.append(literal.group())
+        position = literal.end()
+    parts.append(_canonical_code(query[position:]))
+    return ''.join(parts)
+
+
+def _canonical_code(code):
+    # Whitespace only matters between words ("out center 100")
+    code = _SPACE_AROUND_PUNCTUATION.sub(r'\1', ' '.join(code.split()))
+    code = _TIMEOUT_SETTING.sub('', code)
+    return _DECIMAL.sub(_round_decimal, code)
+
+
+def _decode(body, encoding):
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        return zlib.decompress(body)
+    return body
+
+
+
+class _ResultStream:
+    """
+    Iterates a winning mirror response's body in chunks for a streamed reply,
+    copying it into the result cache once it completes, if it is small enough
+    and a complete Overpass result.
+    Each chunk is scanned, without parsing, for "type" keys (elements counted
+    for the log) and a "remark" key, and the last bytes are kept to check how
+    the body ends. Gzip bodies passed through are inflated a chunk at a time
+    while they may still be cached, and after that only for a COUNT_SAMPLE
+    share of them.
+    """
+
+    def __init__(self, key, response, server, passthrough, done=None):
+        self.key = key
+        self.done = done
+        self.response = response
+        self.server = server
+        self.encoding = response.headers.get('Content-Encoding') if passthrough else None
+        self._chunks = response.raw.stream(STREAM_CHUNK, decode_content=not passthrough)
+        self._buffer = []
+        self._buffered = 0
+        self._bytes = 0
+        self._complete = False
+        self._closed = False
+        self._elements = 0
+        self._tail = b''
+        self._end = b''
+        self._remark = False
+        self._inflater = None
+        self._sampled = True
+        if self.encoding == 'gzip':
+            self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._sampled = random.random() < COUNT_SAMPLE
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._complete = True
+            self.close()
+            raise
+        except Exception as e:
+            print(f"[FAIL] {self.server}: response stream broken after {self._bytes} bytes: {str(e)[:100]}")
+            self.close()
+            raise StopIteration
+        self._bytes += len(chunk)
+        if self._buffer is not None:
+            self._buffered += len(chunk)
+            if self._buffered <= CACHE_MAX_BYTES:
+                self._buffer.append(chunk)
+            else:
+                self._buffer = None  # Too large to cache; keep streaming
+        self._scan(chunk)
+        if self.done is not None and (self._buffer is None or self._remark):
+            self.stop_caching()
+        return chunk
+
+    def stop_caching(self):
+        """Drop the copy for the cache; requests waiting on this stream fetch their own now"""
+        self._buffer = None
+        if self.done is not None:
+            _release(self.key, self.done, uncacheable=True)
+            self.done = None
+
+    def _scan(self, chunk):
+        if self._inflater is None:
+            if self.encoding is None:
+                self._scan_text(chunk)
+            return
+        if self._buffer is None and not self._sampled:
+            # Not cached and not sampled for counting: stop inflating
+            self._inflater = None
+            self._elements = None
+            return
+        try:
+            # Bounded output per call: a small chunk can inflate to megabytes
+            while chunk:
+                self._scan_text(self._inflater.decompress(chunk, STREAM_CHUNK))
+                chunk = self._inflater.unconsumed_tail
+        except zlib.error as e:
+            print(f"[FAIL] {self.server}: gzip body unreadable, not cached: {str(e)[:100]}")
+            self._inflater = None
+            self._elements = None
+            self._buffer = None
+
+    def _scan_text(self, text):
+        if self._elements is not None:
+            counted = self._tail + text
+            self._elements += counted.count(b'"type"')
+            self._tail = counted[-5:]  # A key split across chunks is counted once
+        window = self._end + text
+        if not self._remark and _REMARK.search(window):
+            self._remark = True
+        self._end = window[-SCAN_TAIL:]
+
+    def _cacheable(self):
+        """Whether the finished body is a complete Overpass result, from what _scan saw"""
+        if self._remark or not _RESULT_END.search(self._end):
+            return False
+        return self.encoding is None or (self._inflater is not None and self._inflater.eof)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.response.close()
+        uncacheable = False
+        if self._complete and self._buffer is not None:
+            if self._cacheable():
+                result_cache.set(self.key, (b''.join(self._buffer), self.encoding))
+            else:
+                uncacheable = True
+                print(f"[FAIL] {self.server}: response is not a complete Overpass result; not cached")
+        if self.done is not None:
+            _release(self.key, self.done, uncacheable)
+
+        elements = "elements not counted" if self._elements is None else f"~{self._elements} elements"
+        encoding = f" ({self.encoding})" if self.encoding else ""
+        status = "[OK]" if self._complete else "[FAIL] incomplete:"
+        print(f"{status} {self.server}: streamed {self._bytes} bytes{encoding}, {elements}")
+
+
+def _cached_reply(body, encoding, accept_gzip):
+    if encoding and not (encoding == 'gzip' and accept_gzip):
+        body, encoding = _decode(body, encoding), None
+    headers = {'Content-Type': 'application/json', 'Content-Length': str(len(body))}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return [body], headers
+
+
+def _release(key, done, uncacheable=False):
+    """
+    Wake requests waiting on the stream that owns done. With uncacheable they
+    fetch their own copies; otherwise they retry the cache, and one of them
+    leads a new fetch if the stream failed.
+    """
+    with _streams_lock:
+        if _streams.get(key) is done:
+            del _streams[key]
+    done.uncacheable = uncacheable
+    done.set()
+
+
+def stream_query(query, accept_gzip=False):
+    """
+    Result of query as (body chunks, response headers), from the result cache
+    or streamed from the mirrors without parsing or re-encoding it. A gzip
+    upstream body is passed through as-is when the client accepts gzip.
+    Concurrent identical queries wait (up to OVERPASS_COALESCE_WAIT seconds)
+    for the first one's stream to finish and are answered from the cache; if
+    its result cannot be cached they are released early and fetch their own.
+    Raises OverpassUnavailable like fetch().
+    """
+    global _coalesced
+    key = canonical_query(query)
+    while True:
+        cached, fresh = result_cache.get(key)
+        if cached is not None and fresh:
+            result_cache.hits += 1
+            return _cached_reply(*cached, accept_gzip)
+
+        with _streams_lock:
+            done = _streams.get(key)
+            leader = done is None
+            if leader:
+                done = _streams[key] = _StreamDone()
+        if leader:
+            break
+        # Another request is streaming this query: wait for it to fill the cache
+        _coalesced += 1
+        left = deadline.remaining()
+        if not done.wait(COALESCE_WAIT if left is None else min(COALESCE_WAIT, left)):
+            if deadline.expired():
+                raise OverpassUnavailable(DEADLINE_ERROR, 0, len(MIRRORS))
+            done = None  # Its client is slow to read: fetch our own copy
+            break
+        if done.uncacheable:
+            done = None  # Its result will not be cached: fetch our own copy alongside the others
+            break
+        # Loop: answered from the cache, or we lead a new fetch if that one failed
+
+    result_cache.misses += 1
+    try:
+        response, server = fetch(query)
+    except BaseException:
+        if done is not None:
+            _release(key, done)
+        raise
+
+    encoding = response.headers.get('Content-Encoding')
+    passthrough = encoding is None or (encoding == 'gzip' and accept_gzip)
+    headers = {'Content-Type': response.headers.get('Content-Type', 'application/json')}
+    if passthrough and response.headers.get('Content-Length'):
+        headers['Content-Length'] = response.headers['Content-Length']
+    if passthrough and encoding:
+        headers['Content-Encoding'] = encoding
+    stream = _ResultStream(key, response, server, passthrough, done)
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and int(length) > CACHE_MAX_BYTES:
+        stream.stop_caching()  # Content-Length counts the body as sent: a decoded body is larger still
+    return stream, headers
+
+
+def stats():
+    return {
+        "hedge_delay_ms": round(HEDGE_DELAY * 1000),
+        "hedge_fanout": HEDGE_FANOUT,
+        "timeout": REQUEST_TIMEOUT,
+        "threads": THREADS,
+        "health_window": HEALTH_WINDOW,
+        "cache": dict(result_cache.stats(), coalesced=_coalesced),
+        "mirrors": health.snapshot()
+    }
@@ -0,0 +1,255 @@
+"""
+Spatial tile cache for Overpass radius searches.
+
+The store search sends queries shaped like
+
+    [out:json][timeout:25];
+    (
+      node["shop"="bakery"](around:3218.68,40.71,-74.0);
+      way["shop"="bakery"](around:3218.68,40.71,-74.0);
+    );
+    out center 100;
+
+Two such searches a few hundred metres apart share most of their stores, but
+their query text differs, so the query-result cache cannot reuse one for the
+other. tiled_query() instead covers the search circle with fixed slippy-map
+tiles and caches each tile's elements per tag filter. Only the tiles missing
+from the cache are fetched (one bounding-box query per tag filter), and the
+merged tile contents are filtered by the requested radius, de-duplicated and
+ordered and limited the way Overpass orders and limits a union (by type, then
+ID). Ways are placed and filtered by their center point.
+
+Tile fetches have no result limit (a tile must be cached whole), so only
+searches that pin a tag value are tiled. Queries of any other shape, queries
+with a key-only filter such as ["shop"], and circles needing more than
+OVERPASS_TILE_MAX tiles are left to the query-result cache, which keeps the
+search's own limit (tiled_query returns None). A fetch answered with an
+Overpass runtime error ("remark") or a body that is not JSON caches no tiles.
+
+Configuration (environment variables):
+- OVERPASS_TILE_ZOOM:       slippy-map zoom of cached tiles (default 14, ~1.9 km at 40° latitude)
+- OVERPASS_TILE_MAX:        largest number of tiles per tag filter served from tiles (default 16; 0 = off)
+- OVERPASS_TILE_CACHE_SIZE: cached (tag filter, tile) entries (default 4096)
+"""
+import math
+import os
+import re
+
+import overpass
+from cache import TTLCache
+
+TILE_ZOOM = int(os.environ.get('OVERPASS_TILE_ZOOM', 14))
+TILE_MAX = int(os.environ.get('OVERPASS_TILE_MAX', 16))
+TILE_CACHE_SIZE = int(os.environ.get('OVERPASS_TILE_CACHE_SIZE', 4096))
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = 111320
+TYPE_ORDER = {"node": 0, "way": 1, "relation": 2}
+COPYRIGHT = ("The data included in this document is from www.openstreetmap.org. "
+             "The data is made available under ODbL.")
+
+# Tiles expire with the query-result cache so both paths show equally fresh data
+tile_cache = TTLCache("overpass-tiles", maxsize=TILE_CACHE_SIZE, ttl=overpass.CACHE_TTL, max_stale=0)
+
+_FILTER = r'(?:\[(?:"(?:[^"\\]|\\.)*"|[^\]"])*\])+'
+_NUMBER = r'-?\d+(?:\.\d+)?'
+_STATEMENT = re.compile(
+    rf'\s*(node|way)({_FILTER})\(\s*around\s*:\s*({_NUMBER})\s*,\s*({_NUMBER})\s*,\s*({_NUMBER})\s*\)\s*;'
+)
+# A filter testing only for a key (["shop"]) matches too much to fetch tiles without a limit
+_KEY_ONLY = re.compile(r'\[\s*(?:"(?:[^"\\]|\\.)*"|[\w:]+)\s*\]')
+_QUERY = re.compile(r'\s*\[out:json\](?:\[timeout:\d+\])?\s*;\s*\((.*)\)\s*;\s*out\s+center(?:\s+(\d+))?\s*;\s*', re.S)
+
+
+def parse_radius_search(query):
+    """
+    Split a radius search into ({tag filter: element types}, lat, lon, radius, limit),
+    or return None if the query is not one tiled_query can answer.
+    """
+    match = _QUERY.fullmatch(query)
+    if match is None:
+        return None
+    body, limit = match.groups()
+
+    filters = {}
+    circle = None
+    position = 0
+    for statement in _STATEMENT.finditer(body):
+        if statement.start() != position:
+            return None  # Something between statements we do not understand
+        position = statement.end()
+        element_type, tag_filter, radius, lat, lon = statement.groups()
+        if circle is None:
+            circle = (radius, lat, lon)
+        elif circle != (radius, lat, lon):
+            return None  # Statements around different circles
+        filters.setdefault(overpass.canonical_query(tag_filter), set()).add(element_type)
+    if circle is None or body[position:].strip():
+        return None
+
+    if any(_KEY_ONLY.fullmatch(tag_filter) for tag_filter in filters):
+        return None
+    radius, lat, lon = (float(value) for value in circle)
+    return filters, lat, lon, radius, int(limit) if limit else None
+
+
+def _tile_for(lat, lon):
+    """Slippy-map (x, y) of the tile containing a point"""
+    n = 2 ** TILE_ZOOM
+    lat = max(-85.0511, min(85.0511, lat))
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _tile_bbox(x, y):
+    """(south, west, north, east) of a tile"""
+    n = 2 ** TILE_ZOOM
+
+    def lat_at(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return lat_at(y + 1), x / n * 360 - 180, lat_at(y), (x + 1) / n * 360 - 180
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
+
+
+def tiles_for_circle(lat, lon, radius):
+    """Tiles (x, y) that intersect the circle"""
+    dlat = radius / METERS_PER_DEGREE
+    dlon = radius / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(lat))))
+    x_min, y_min = _tile_for(lat + dlat, lon - dlon)
+    x_max, y_max = _tile_for(lat - dlat, lon + dlon)
+
+    tiles = []
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            south, west, north, east = _tile_bbox(x, y)
+            # Nearest point of the tile to the center
+            nearest_lat = min(max(lat, south), north)
+            nearest_lon = min(max(lon, west), east)
+            if distance_m(lat, lon, nearest_lat, nearest_lon) <= radius:
+                tiles.append((x, y))
+    return tiles
+
+
+def _position(element):
+    """(lat, lon) of a node, or of a way's center"""
+    if 'lat' in element and 'lon' in element:
+        return element['lat'], element['lon']
+    center = element.get('center')
+    if center:
+        return center['lat'], center['lon']
+    return None
+
+
+def _fetch_tiles(tag_filter, element_types, tiles):
+    """Fetch every tile in the bounding rectangle of tiles for one tag filter and cache them"""
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+    south, west, _, _ = _tile_bbox(min(xs), max(ys))
+    _, _, north, east = _tile_bbox(max(xs), min(ys))
+    bbox = f"{south:.7f},{west:.7f},{north:.7f},{east:.7f}"
+    statements = ''.join(f"{element_type}{tag_filter}({bbox});" for element_type in sorted(element_types))
+    query = f"[out:json][timeout:25];({statements});out center;"
+
+    print(f"Overpass tiles: fetching {len(tiles)} missing tile(s) for {tag_filter}")
+    response, server = overpass.fetch(query)
+    with response:
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+    # A runtime error (timeout, out of memory) comes back as a 200 with a partial result
+    if not isinstance(data, dict) or not isinstance(data.get('elements'), list):
+        error = "Response is not Overpass JSON"
+    elif 'remark' in data:
+        error = str(data['remark'])[:100]
+    else:
+        error = None
+    if error is not None:
+        print(f"[FAIL] {server}: {error}; no tiles cached for {tag_filter}")
+        raise overpass.OverpassUnavailable(error, 1, len(overpass.MIRRORS))
+    elements = data['elements']
+    print(f"[OK] {server}: {len(elements)} elements for {tag_filter}")
+
+    # Every tile in the rectangle was fetched in full, including ones already cached
+    rectangle = {(x, y): [] for x in range(min(xs), max(xs) + 1) for y in range(min(ys), max(ys) + 1)}
+    for element in elements:
+        position = _position(element)
+        if position is None:
+            continue
+        bucket = rectangle.get(_tile_for(*position))
+        if bucket is not None:  # Ways reaching in from a tile outside the rectangle belong to that tile
+            bucket.append(element)
+    for (x, y), tile_elements in rectangle.items():
+        tile_cache.set((tag_filter, tuple(sorted(element_types)), TILE_ZOOM, x, y), tile_elements)
+    return rectangle
+
+
+def tiled_query(query):
+    """
+    Answer a radius search from cached tiles, fetching only the missing ones.
+    Returns an Overpass-shaped JSON dict, or None if the query should go to
+    the query-result cache instead. Raises overpass.OverpassUnavailable if a
+    missing tile could not be fetched.
+    """
+    if TILE_MAX <= 0:
+        return None
+    search = parse_radius_search(query)
+    if search is None:
+        return None
+    filters, lat, lon, radius, limit = search
+
+    tiles = tiles_for_circle(lat, lon, radius)
+    if len(tiles) > TILE_MAX:
+        return None
+
+    found = {}
+    cached_tiles = 0
+    for tag_filter, element_types in filters.items():
+        types_key = tuple(sorted(element_types))
+        by_tile = {}
+        missing = []
+        for x, y in tiles:
+            elements, fresh = tile_cache.get((tag_filter, types_key, TILE_ZOOM, x, y))
+            if elements is None or not fresh:
+                missing.append((x, y))
+            else:
+                by_tile[(x, y)] = elements
+        cached_tiles += len(tiles) - len(missing)
+        if missing:
+            fetched = _fetch_tiles(tag_filter, element_types, missing)
+            by_tile.update((tile, fetched[tile]) for tile in missing)
+
+        for elements in by_tile.values():
+            for element in elements:
+                position = _position(element)
+                if position is not None and distance_m(lat, lon, *position) <= radius:
+                    found[(element['type'], element['id'])] = element
+
+    elements = sorted(found.values(), key=lambda element: (TYPE_ORDER.get(element['type'], 3), element['id']))
+    if limit is not None:
+        elements = elements[:limit]
+    print(f"Overpass tiles: {cached_tiles}/{len(tiles) * len(filters)} tile(s) from cache, {len(elements)} results")
+    return {
+        "version": 0.6,
+        "generator": "FIX$ Overpass tile cache",
+        "osm3s": {"copyright": COPYRIGHT},
+        "elements": elements
+    }
+
+
+def stats():
+    return {
+        "zoom": TILE_ZOOM,
+        "max_tiles": TILE_MAX,
+        "cache": tile_cache.stats()
+    }
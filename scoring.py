@@ -0,0 +1,364 @@
+"""
+Pure EJV scoring core.
+
+Everything here is a plain function of its arguments: no Census/BLS lookups,
+no caches, no logging. Inputs and results are plain dicts and numbers, so the
+functions can be pickled and run in a ProcessPoolExecutor worker as well as on
+the request thread. app.py resolves the inputs (economic context, BLS wage and
+industry employment data) and delegates the arithmetic here.
+
+economic_data arguments are dicts with unemployment_rate and median_income
+(ZCTA) and, for the calculators, tract_median_income, as returned by
+resolve_economic_context in app.py.
+"""
+import hashlib
+
+LIVING_WAGE_HOURS = 2080
+LIVING_WAGE_FACTOR = 0.35
+SVI = 0.7
+PARTICIPATION_BENCHMARK = 25
+
+DIMENSIONS = ("AES", "ART", "HWI", "PSR", "CAI", "JCE", "FSI", "CED", "ESD")
+NEED_MODIFIER_WEIGHTS = {
+    "AES": 1.05,  # Access to Essential Services
+    "ART": 1.02,  # Access to Resources & Technology
+    "HWI": 1.03,  # Health, Wellness & Inclusion
+}
+
+
+# ---------------------------------------
+# Store-derived variance
+# ---------------------------------------
+def stable_store_hash(store_id):
+    """
+    Non-negative 64-bit hash of store_id that is the same in every process
+    (unlike hash(), which is randomized per interpreter), so scores can be
+    cached across workers and precomputed offline
+    """
+    digest = hashlib.blake2b(str(store_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def generate_consistent_random(store_id, seed_suffix=""):
+    """Generate consistent pseudo-random value based on store_id"""
+    hash_input = f"{store_id}{seed_suffix}".encode()
+    hash_value = int(hashlib.md5(hash_input).hexdigest(), 16)
+    return hash_value / (16 ** 32)  # Normalize to 0-1
+
+
+def store_type_from_id(store_id, store_types):
+    """Extract store type from store_id (format: type_osmid or just osmid)"""
+    store_id_str = str(store_id).lower()
+    for store_type in store_types:
+        if store_type in store_id_str:
+            return store_type
+    return "default"
+
+
+# ---------------------------------------
+# Store profile and payroll
+# ---------------------------------------
+def build_store_profile(store_id, store_type, real_wage, real_employee_count, standards, year):
+    """
+    Derive the store-specific payroll inputs that do not depend on location.
+
+    real_wage:           BLS hourly wage for the store type's occupation, or None
+    real_employee_count: industry average employees per establishment, or None
+    standards:           WAGE_STANDARDS entry for the store type (fallback ranges)
+    year:                calendar year used for the fallback wage inflation
+    """
+    store_hash = stable_store_hash(store_id)
+
+    # If BLS has no wage, use industry standards with real-time adjustments
+    if real_wage is None:
+        base_wage = standards["min"] + (standards["max"] - standards["min"]) * generate_consistent_random(store_id, "wage")
+
+        # Adjust for current date (annual 3% increase simulation)
+        year_offset = year - 2024
+        inflation_multiplier = 1.03 ** year_offset
+        avg_wage = round(base_wage * inflation_multiplier, 2)
+    else:
+        # Add store-specific variance to real wage (±35%)
+        wage_variance = (generate_consistent_random(store_id, "wage") - 0.5) * 0.70
+        # Add additional random component based on store_id digits
+        additional_variance = ((store_hash % 100) / 100 - 0.5) * 0.20
+        avg_wage = round(real_wage * (1 + wage_variance + additional_variance), 2)
+
+    if real_employee_count is None:
+        employee_variance = 0.6
+        min_employees = int(standards["avg_employees"] * (1 - employee_variance))
+        max_employees = int(standards["avg_employees"] * (1 + employee_variance))
+        active_employees = int(min_employees + (max_employees - min_employees) * generate_consistent_random(store_id, "emp"))
+        active_employees = max(3, active_employees)
+    else:
+        # Add store-specific variance to industry average (±60%)
+        employee_variance = (generate_consistent_random(store_id, "emp") - 0.5) * 1.20
+        # Add additional random component
+        additional_variance = ((store_hash % 50) / 50 - 0.5) * 0.30
+        active_employees = int(real_employee_count * (1 + employee_variance + additional_variance))
+        active_employees = max(3, active_employees)
+
+    base_local_hire = 0.40 + (0.55 * generate_consistent_random(store_id, "local"))
+    # Add store-specific adjustment
+    store_adjustment = ((store_hash % 30) / 100)  # 0-30% additional variance
+
+    # Community spending varies by store profitability and local conditions
+    community_spend_pct = 0.005 + (0.25 * generate_consistent_random(store_id, "community"))
+
+    return {
+        "store_type": store_type,
+        "avg_wage": avg_wage,
+        "active_employees": active_employees,
+        "base_local_hire": base_local_hire + store_adjustment,
+        "community_spend_pct": community_spend_pct
+    }
+
+
+def payroll_from_profile(profile, unemployment_rate):
+    """Daily payroll figures for a store profile under local unemployment conditions"""
+    avg_wage = profile["avg_wage"]
+    active_employees = profile["active_employees"]
+
+    # Higher unemployment = higher local hire percentage
+    unemployment_factor = min(unemployment_rate / 10.0, 0.20)  # Up to 20% boost
+    local_hire_pct = min(0.98, profile["base_local_hire"] + unemployment_factor)
+    local_hire_pct = round(local_hire_pct, 2)
+
+    daily_payroll = round(active_employees * avg_wage * 8, 2)
+    community_spend_today = round(daily_payroll * profile["community_spend_pct"], 2)
+
+    return {
+        "avg_wage": avg_wage,
+        "active_employees": active_employees,
+        "daily_payroll": daily_payroll,
+        "local_hire_pct": local_hire_pct,
+        "community_spend_today": community_spend_today,
+        "store_type": profile["store_type"]
+    }
+
+
+# ---------------------------------------
+# Living Wage Estimator
+# ---------------------------------------
+def living_wage(median_income):
+    return (median_income / LIVING_WAGE_HOURS) * LIVING_WAGE_FACTOR
+
+
+# ---------------------------------------
+# EJV SCORING FUNCTIONS (0–25 each)
+# ---------------------------------------
+def wage_score(avg_wage, living_wage):
+    return min(25, (avg_wage / living_wage) * 25)
+
+
+def hiring_score(local_hire_pct, svi=SVI):
+    return min(25, local_hire_pct * 25 * (1 + svi))
+
+
+def community_score(community_spend, payroll):
+    return min(25, (community_spend / payroll) * 25)
+
+
+def participation_score(active_employees, benchmark=PARTICIPATION_BENCHMARK):
+    return min(25, (active_employees / benchmark) * 25)
+
+
+# ---------------------------------------
+# ZIP NEED MODIFIER - based on local conditions
+# ---------------------------------------
+def base_need_modifier(economic_data):
+    """Unweighted ZIP need modifier from unemployment and median income"""
+    unemployment = economic_data.get('unemployment_rate', 5.0)
+    median_income = economic_data.get('median_income', 50000)
+
+    # Higher unemployment + lower income = higher need (higher modifier)
+    unemployment_factor = min(unemployment / 10.0, 1.0)  # Normalize to 0-1
+    income_factor = max(0, 1 - (median_income / 75000))  # Lower income = higher need
+
+    # Combine factors: 0.80 (low need) to 1.10 (high need)
+    return 0.80 + (0.30 * ((unemployment_factor + income_factor) / 2))
+
+
+def _weighted_need_modifier(base_modifier, dimension):
+    modifier = base_modifier * NEED_MODIFIER_WEIGHTS.get(dimension, 1)
+    # Clamp to valid range [0.80, 1.10]
+    return round(min(1.10, max(0.80, modifier)), 2)
+
+
+def zip_need_modifier(economic_data, dimension):
+    """
+    ZIP-level need modifier for a dimension, from 0.80 (low need) to 1.10 (high need)
+    Only AES, ART and HWI are weighted; other dimensions get the base modifier.
+    """
+    return _weighted_need_modifier(base_need_modifier(economic_data), dimension)
+
+
+def justice_context(economic_data):
+    """
+    Everything EJV v2 needs from a ZIP besides the store: the inputs, the base
+    need modifier and the AES/ART/HWI modifiers. Depends only on the ZIP's
+    unemployment rate and median income, so one entry serves every store there.
+    """
+    base_modifier = base_need_modifier(economic_data)
+    return {
+        "unemployment_rate": economic_data.get('unemployment_rate', 5.0),
+        "median_income": economic_data.get('median_income', 50000),
+        "base_modifier": base_modifier,
+        "modifiers": {dim: _weighted_need_modifier(base_modifier, dim) for dim in NEED_MODIFIER_WEIGHTS}
+    }
+
+
+# ---------------------------------------
+# EJV v1 and v2
+# ---------------------------------------
+def score_ejv_v1(payroll, economic_data):
+    """EJV v1 (0-100 composite) for a store's payroll in an area"""
+    median_income = economic_data["tract_median_income"]
+    lw = living_wage(median_income)
+
+    w_score = wage_score(payroll["avg_wage"], lw)
+    h_score = hiring_score(payroll["local_hire_pct"])
+    c_score = community_score(
+        payroll["community_spend_today"],
+        payroll["daily_payroll"]
+    )
+    p_score = participation_score(payroll["active_employees"])
+
+    ejv = w_score + h_score + c_score + p_score
+
+    # Calculate wealth metrics
+    daily_wages_paid = payroll["daily_payroll"]
+    wealth_retained = daily_wages_paid * payroll["local_hire_pct"] + payroll["community_spend_today"]
+    wealth_leakage = daily_wages_paid * (1 - payroll["local_hire_pct"])
+
+    return {
+        "EJV": round(ejv, 2),
+        "wage_score": round(w_score, 2),
+        "hiring_score": round(h_score, 2),
+        "community_score": round(c_score, 2),
+        "participation_score": round(p_score, 2),
+        "wealth_retained": round(wealth_retained, 2),
+        "wealth_leakage": round(wealth_leakage, 2),
+        "median_income": median_income,
+        "living_wage": round(lw, 2),
+        "unemployment_rate": round(economic_data.get('unemployment_rate', 5.0), 1),
+        "local_hire_pct": payroll["local_hire_pct"]
+    }
+
+
+def justice_score(payroll, economic_data, justice=None):
+    """
+    JS_ZIP and its parts for a store's payroll in an area: living wage, the
+    normalized component scores (w, h, c, p), the nine dimensions, the need
+    modifiers and the adjusted dimensions (all unrounded)
+    """
+    lw = living_wage(economic_data["tract_median_income"])
+
+    # Calculate base dimension scores (normalized to 0-1)
+    w_score = wage_score(payroll["avg_wage"], lw) / 25  # 0-1
+    h_score = hiring_score(payroll["local_hire_pct"]) / 25  # 0-1
+    c_score = community_score(payroll["community_spend_today"], payroll["daily_payroll"]) / 25  # 0-1
+    p_score = participation_score(payroll["active_employees"]) / 25  # 0-1
+
+    # Map dimensions to our scores
+    # AES (Access to Essential Services) = Community Score
+    # ART (Access to Resources & Technology) = Wage Score (better wages = tech access)
+    # HWI (Health, Wellness & Inclusion) = Hiring Score (local hiring = inclusion)
+    # Other dimensions use base scores
+    dimensions = {
+        "AES": c_score,  # Access to Essential Services
+        "ART": w_score,  # Access to Resources & Technology
+        "HWI": h_score,  # Health, Wellness & Inclusion
+        "PSR": c_score,  # Public Service Representation
+        "CAI": p_score,  # Cultural Awareness & Inclusivity
+        "JCE": h_score,  # Job Creation/Economic Empowerment
+        "FSI": w_score,  # Financial Support & Investment
+        "CED": (c_score + p_score) / 2,  # Community Engagement & Development
+        "ESD": h_score,  # Education & Skill Development
+    }
+
+    # Step 1: Adjust dimension scores with NM (only for AES, ART, HWI)
+    if justice is None:
+        justice = justice_context(economic_data)
+    modifiers = dict(justice["modifiers"])
+    adjusted_dimensions = {}
+    for dim, score in dimensions.items():
+        if dim in modifiers:
+            adjusted_dimensions[dim] = min(1.0, max(0.0, score * modifiers[dim]))
+        else:
+            adjusted_dimensions[dim] = score
+
+    # Step 2: Calculate Justice Score (average of all adjusted dimensions × 100)
+    js_zip = sum(adjusted_dimensions.values()) / len(adjusted_dimensions) * 100
+
+    return {
+        "living_wage": lw,
+        "scores": (w_score, h_score, c_score, p_score),
+        "dimensions": dimensions,
+        "modifiers": modifiers,
+        "adjusted_dimensions": adjusted_dimensions,
+        "js_zip": js_zip
+    }
+
+
+def score_ejv_v2(payroll, economic_data, purchase_amount=100.0, justice=None):
+    """
+    EJV v2 (justice-weighted local impact) for a store's payroll in an area
+
+    Formula: EJV v2 = (P × LC) × (JS_ZIP / 100)
+
+    justice: the ZIP's justice_context, if already computed
+    """
+    median_income = economic_data["tract_median_income"]
+    js = justice_score(payroll, economic_data, justice)
+    lw = js["living_wage"]
+    w_score, h_score, c_score, p_score = js["scores"]
+    dimensions = js["dimensions"]
+    modifiers = js["modifiers"]
+    adjusted_dimensions = js["adjusted_dimensions"]
+    js_zip = js["js_zip"]
+
+    # Local Capture = local hire percentage
+    lc = payroll["local_hire_pct"]
+
+    # Step 3: Compute EJV v2 = (P × LC) × (JS_ZIP / 100)
+    ejv_v2 = (purchase_amount * lc) * (js_zip / 100)
+
+    # Also calculate traditional EJV for comparison
+    ejv_v1 = (w_score + h_score + c_score + p_score) * 25
+
+    # Calculate wealth metrics
+    daily_wages_paid = payroll["daily_payroll"]
+    wealth_retained = daily_wages_paid * lc + payroll["community_spend_today"]
+    wealth_leakage = daily_wages_paid * (1 - lc)
+
+    return {
+        "ejv_version": "2.0",
+        "EJV": round(ejv_v1, 2),  # Traditional EJV (0-100 scale)
+        "ejv_v2": round(ejv_v2, 2),  # Justice-Weighted Local Impact ($)
+        "purchase_amount": purchase_amount,
+        "local_capture": round(lc, 3),
+        "justice_score_zip": round(js_zip, 2),
+        "zip_modifiers": modifiers,
+        "dimensions": {dim: round(score, 3) for dim, score in dimensions.items()},
+        "adjusted_dimensions": {k: round(v, 3) for k, v in adjusted_dimensions.items()},
+        "wage_score": round(w_score * 25, 2),
+        "hiring_score": round(h_score * 25, 2),
+        "community_score": round(c_score * 25, 2),
+        "participation_score": round(p_score * 25, 2),
+        "wealth_retained": round(wealth_retained, 2),
+        "wealth_leakage": round(wealth_leakage, 2),
+        "median_income": median_income,
+        "living_wage": round(lw, 2),
+        "unemployment_rate": round(economic_data.get('unemployment_rate', 5.0), 1),
+        "local_hire_pct": lc,
+        "calculation_formula": f"EJV v2 = ({purchase_amount} × {round(lc, 2)}) × ({round(js_zip, 2)}/100) = ${round(ejv_v2, 2)}"
+    }
+
+
+def ejv_v2_curve(local_capture, js_zip, purchase_amounts):
+    """
+    EJV v2 = (P × LC) × (JS_ZIP / 100) is linear in P, so a whole purchase-amount
+    sweep is evaluated from one LC and JS_ZIP; values match score_ejv_v2 per amount
+    """
+    return [round((amount * local_capture) * (js_zip / 100), 2) for amount in purchase_amounts]
@@ -0,0 +1,62 @@
+"""
+Request coalescing for upstream API calls.
+
+SingleFlight makes sure only one call per key is in flight at a time: when
+several threads ask for the same key concurrently, the first one runs the
+call and the others wait for and share its result (or its exception).
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight call per key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0  # Calls answered by another caller's in-flight request
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() for key, or wait for the call already in flight for key.
+        Waiters give up with TimeoutError after timeout seconds (None = wait for the call).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"timed out waiting for in-flight call {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
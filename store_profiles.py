@@ -0,0 +1,98 @@
+"""
+Optional persisted table of deterministic store profiles.
+
+A store profile holds everything get_payroll_data derives from the store ID
+alone (wage, employee count, base local-hire share, community-spend fraction).
+app.py keeps recently used profiles in an in-process LRU; this module adds a
+SQLite table behind it so profiles survive restarts and can be shared by
+workers on the same host.
+
+Persistence is off unless STORE_PROFILE_DB points at a writable SQLite file.
+Rows are keyed by profile version, so bumping PROFILE_VERSION in app.py when
+the derivation changes makes old rows unreachable instead of wrong.
+"""
+import os
+import sqlite3
+import threading
+
+DB_PATH = os.environ.get('STORE_PROFILE_DB')
+
+PROFILE_FIELDS = ("avg_wage", "active_employees", "base_local_hire", "community_spend_pct")
+
+_conn = None
+_conn_lock = threading.Lock()
+_disabled = not DB_PATH
+
+
+def _connect():
+    """Open (and create) the profile table, or return None if persistence is off"""
+    global _conn, _disabled
+    if _disabled or _conn is not None:
+        return _conn
+    with _conn_lock:
+        if _disabled or _conn is not None:
+            return _conn
+        try:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            # WAL + NORMAL: per-profile commits do not wait on an fsync
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS store_profiles (
+                    store_id TEXT NOT NULL,
+                    store_type TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    avg_wage REAL NOT NULL,
+                    active_employees INTEGER NOT NULL,
+                    base_local_hire REAL NOT NULL,
+                    community_spend_pct REAL NOT NULL,
+                    PRIMARY KEY (store_id, store_type, version)
+                )
+            """)
+            conn.commit()
+            _conn = conn
+            print(f"[OK] Store profile table: {DB_PATH}")
+        except sqlite3.Error as e:
+            print(f"Store profile table disabled: {e}")
+            _disabled = True
+        return _conn
+
+
+def load(store_id, store_type, version):
+    """Return the persisted profile dict for a store, or None"""
+    conn = _connect()
+    if conn is None:
+        return None
+    try:
+        with _conn_lock:
+            row = conn.execute(
+                f"SELECT {', '.join(PROFILE_FIELDS)} FROM store_profiles"
+                " WHERE store_id = ? AND store_type = ? AND version = ?",
+                (str(store_id), store_type, version)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Store profile lookup error: {e}")
+        return None
+    if row is None:
+        return None
+    profile = dict(zip(PROFILE_FIELDS, row))
+    profile["store_type"] = store_type
+    return profile
+
+
+def save(store_id, profile, version):
+    """Persist a profile (no-op when persistence is off)"""
+    conn = _connect()
+    if conn is None:
+        return
+    try:
+        with _conn_lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO store_profiles"
+                f" (store_id, store_type, version, {', '.join(PROFILE_FIELDS)})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(store_id), profile["store_type"], version, *(profile[field] for field in PROFILE_FIELDS))
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"Store profile save error: {e}")